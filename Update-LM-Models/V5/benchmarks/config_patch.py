@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Write-path benchmark for large opencode.json files.
+
+Builds a config whose MCP, agent and instruction sections dwarf its model
+lists, then times one sync that adds a model three ways: the old full
+parse + reconcile + ``json.dumps(indent=2)``, the ConfigDocument splice
+that only decodes and rewrites the changed ``models`` span, and the same
+splice with the layout a LayoutCache keeps for an unchanged file. Also
+checks that the splice leaves every byte outside that span untouched and
+produces the same config as the full rewrite.
+
+    python3 benchmarks/config_patch.py [--size-mb 20] [--models 200] [--runs 9]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnilink.reconcile import new_provider, reconcile_results  # noqa: E402
+from omnilink.splice import ConfigDocument  # noqa: E402
+
+
+def build_config(size_mb, models):
+    """A hand-formatted config: compact filler sections around a normal provider block."""
+    filler = {f"server-{i}": {"type": "local", "command": ["node", f"/opt/mcp/{i}/index.js"],
+                              "environment": {"TOKEN": "x" * 200}}
+              for i in range(max(1, int(size_mb * 1024 * 1024 / 330)))}
+    provider = {"ollama": {"npm": "@ai-sdk/openai-compatible", "name": "Ollama (remote)",
+                           "options": {"baseURL": "http://gpu01:11434/v1"},
+                           "models": {f"model-{i}:latest": {"name": f"Model-{i}:Latest"} for i in range(models)}}}
+    # Key order and compact filler differ from what json.dumps(indent=2) would produce
+    return ('{\n  "$schema": "https://opencode.ai/config.json",\n'
+            f'  "mcp": {json.dumps(filler)},\n'
+            f'  "provider": {json.dumps(provider, indent=2).replace(chr(10), chr(10) + "  ")},\n'
+            '  "instructions": ["AGENTS.md"]\n}\n').encode()
+
+
+def median_ms(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size-mb", type=float, default=20, help="size of the untouched sections")
+    parser.add_argument("--models", type=int, default=200, help="models in the provider's list")
+    parser.add_argument("--runs", type=int, default=9)
+    args = parser.parse_args()
+
+    original = build_config(args.size_mb, args.models)
+    results = {"OLLAMA": [f"model-{i}:latest" for i in range(args.models + 1)],
+               "OLLAMA_BASE": "http://gpu01:11434/v1"}
+
+    def full():
+        config = json.loads(original.decode("utf-8"))
+        providers = config.setdefault("provider", {})
+        for provider_key, provider_name, base_url, _, diff in reconcile_results(
+                results, lambda key: providers.get(key, {}).get("models", {})):
+            entry = providers.setdefault(provider_key, new_provider(provider_name, base_url))
+            diff.apply(entry.setdefault("models", {}))
+        return json.dumps(config, indent=2).encode("utf-8")
+
+    def splice(layout=None):
+        document = ConfigDocument(original, layout)
+        document.reconcile(results)
+        return document.render()
+
+    patched = splice()
+    if splice(ConfigDocument(original).layout()) != patched:
+        print("FAIL: cached layout gives a different result")
+        return 1
+    head = original.index(b'"models": {')
+    tail = original[original.index(b',\n  "instructions"'):]
+    if patched[:head] != original[:head] or not patched.endswith(tail):
+        print("FAIL: bytes outside the model list changed")
+        return 1
+    if json.loads(patched) != json.loads(full()):
+        print("FAIL: spliced config differs from the full rewrite")
+        return 1
+
+    print(f"config:        {len(original) / 1024 / 1024:.1f} MiB, {args.models} models")
+    print(f"full rewrite:  {median_ms(full, args.runs):8.1f} ms (p50)")
+    print(f"splice:        {median_ms(splice, args.runs):8.1f} ms (p50)")
+    layout = ConfigDocument(original).layout()
+    print(f"  cached layout: {median_ms(lambda: splice(layout), args.runs):6.1f} ms (p50)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""LAN discovery benchmark against fake backends on loopback aliases.
+
+Spreads a fleet of stand-in backends over a loopback subnet on their
+default ports (see fakeservers.py ``--subnet``), scans the whole subnet
+with omnilink.discover and checks every backend was found and identified
+as the right flavor. ``--models 0`` serves empty catalogs, which forces
+the native-endpoint probes.
+
+    python3 benchmarks/discover_scan.py
+    python3 benchmarks/discover_scan.py --endpoints 60 --models 0 --latency-ms 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from fakeservers import FakeFleet, add_backend_arguments, backends_from_args
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnilink.discover import DEFAULT_CONCURRENCY, DEFAULT_CONNECT_TIMEOUT, discover  # noqa: E402
+
+FLAVOR_KEYS = {"ollama": "OLLAMA", "lmstudio": "LMSTUDIO", "llamacpp": "LLAMA"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mu discover against fake backends.")
+    add_backend_arguments(parser)
+    parser.set_defaults(endpoints=12, subnet="127.0.1.0/24")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT, help="connect timeout")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="connects in flight")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    backends = backends_from_args(args)
+    with FakeFleet(backends) as fleet:
+        expected = {url: FLAVOR_KEYS[backend.flavor] for backend, url in zip(backends, fleet.urls)}
+        start = time.perf_counter()
+        found = discover([args.subnet], timeout=args.timeout, concurrency=args.concurrency)
+        elapsed = time.perf_counter() - start
+
+    got = {entry["url"]: entry for entry in found}
+    missing = sorted(set(expected) - set(got))
+    wrong = sorted(url for url in expected if url in got and got[url]["provider"] != expected[url])
+    how = {}
+    for entry in found:
+        how[entry["how"]] = how.get(entry["how"], 0) + 1
+    report = {
+        "subnet": args.subnet,
+        "backends": len(backends),
+        "found": len(found),
+        "missing": missing,
+        "misidentified": wrong,
+        "identified_by": how,
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Scanned {args.subnet} in {report['elapsed_ms']:.0f} ms: "
+              f"{len(found)}/{len(backends)} backends found "
+              f"({', '.join(f'{n} by {k}' for k, n in sorted(how.items()))})")
+        for url in missing:
+            print(f"  missing:        {url}")
+        for url in wrong:
+            print(f"  misidentified:  {url} as {got[url]['provider']}, expected {expected[url]}")
+    if missing or wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Local stand-ins for Ollama, LM Studio and llama.cpp model endpoints.
+
+Each fake backend listens on its own loopback port and answers
+``GET .../models`` (and Ollama's native ``/api/tags``) with a catalog
+shaped like the real server's, with tunable model count, latency,
+failure rate and per-model payload size. Ollama's ``/api/show`` and LM
+Studio's ``/api/v0/models/<id>`` answer model detail requests, and
+``POST /v1/chat/completions`` streams a one-token reply after a simulated
+load delay the first time each model is used.
+The servers run in a child process so their CPU time does not contend
+with the client being measured.
+
+    python3 benchmarks/fakeservers.py --endpoints 3 --models 10 --latency-ms 50
+
+prints one URL per backend and serves until interrupted. With
+``--subnet 127.0.1.0/24`` the backends are spread over loopback aliases
+on their default ports instead, which is what ``mu discover`` expects
+(Linux routes all of 127.0.0.0/8 to lo; on macOS add the aliases with
+``ifconfig lo0 alias``).
+"""
+import argparse
+import asyncio
+import functools
+import hashlib
+import ipaddress
+import json
+import multiprocessing
+import random
+import re
+import signal
+import sys
+import time
+import urllib.parse
+
+FLAVORS = ("ollama", "lmstudio", "llamacpp")
+DEFAULT_PORTS = {"ollama": 11434, "lmstudio": 1234, "llamacpp": 8080}
+
+
+class Backend:
+    """Settings for one fake endpoint."""
+
+    def __init__(self, flavor, models=10, latency_ms=0, jitter_ms=0, failure_rate=0.0,
+                 payload_bytes=0, churn=0.0, prefix="model", host="127.0.0.1", port=0, load_ms=0):
+        if flavor not in FLAVORS:
+            raise ValueError(f"unknown flavor {flavor!r}")
+        self.flavor = flavor
+        self.models = models
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.payload_bytes = payload_bytes
+        self.churn = churn
+        self.prefix = prefix
+        self.host = host
+        self.port = port
+        self.load_ms = load_ms
+
+    def catalog_key(self):
+        return (self.flavor, self.models, self.payload_bytes, self.churn, self.prefix)
+
+    def model_ids(self, generation=0):
+        """Model ids for a catalog generation; odd generations rename the first `churn` share."""
+        changed = int(self.models * self.churn) if generation % 2 else 0
+        ids = [f"{self.prefix}-{i:05d}" for i in range(self.models)]
+        for i in range(changed):
+            ids[i] += "-b"
+        if self.flavor == "ollama":
+            ids = [f"{model_id}:latest" for model_id in ids]
+        return ids
+
+    def render(self, generation=0):
+        """Response body shaped like the real backend's /v1/models."""
+        now = int(time.time())
+        pad = "x" * self.payload_bytes
+        ids = self.model_ids(generation)
+        if self.flavor == "ollama":
+            data = [{"id": i, "object": "model", "created": now, "owned_by": "library"} for i in ids]
+            doc = {"object": "list", "data": data}
+        elif self.flavor == "lmstudio":
+            data = [{"id": i, "object": "model", "owned_by": "organization_owner"} for i in ids]
+            doc = {"data": data, "object": "list"}
+        else:
+            data = [{"id": i, "object": "model", "created": now, "owned_by": "llamacpp",
+                     "meta": {"vocab_type": 2, "n_ctx_train": 8192}} for i in ids]
+            doc = {"models": [{"name": i, "model": i} for i in ids], "object": "list", "data": data}
+        if pad:
+            for entry in data:
+                entry["description"] = pad
+        return json.dumps(doc).encode()
+
+    def render_tags(self, generation=0):
+        """Body of Ollama's native /api/tags: the same models with size and content digest."""
+        models = [{"name": i, "model": i, "modified_at": "2025-01-01T00:00:00Z", "size": 4_000_000_000,
+                   "digest": hashlib.sha256(i.encode()).hexdigest(),
+                   "details": {"format": "gguf", "family": "llama", "parameter_size": "8B"}}
+                  for i in self.model_ids(generation)]
+        return json.dumps({"models": models}).encode()
+
+    def catalogs(self, generation=0):
+        """Catalog bodies by path: ``/models`` (any .../models URL) plus native ones."""
+        bodies = {"/models": self.render(generation)}
+        if self.flavor == "ollama":
+            bodies["/api/tags"] = self.render_tags(generation)
+        return bodies
+
+    def knows(self, model_id):
+        if not hasattr(self, "_known"):
+            self._known = set(self.model_ids(0)) | set(self.model_ids(1))
+        return model_id in self._known
+
+    def details(self, method, path, body):
+        """Per-model detail response (Ollama /api/show, LM Studio /api/v0/models/<id>), or None."""
+        if self.flavor == "ollama" and method == "POST" and path == "/api/show":
+            model_id = json.loads(body or b"{}").get("model")
+            if not self.knows(model_id):
+                return None
+            return json.dumps({
+                "details": {"format": "gguf", "family": "llama"},
+                "model_info": {"general.architecture": "llama", "llama.context_length": 131072},
+                "capabilities": ["completion", "tools"],
+            }).encode()
+        if self.flavor == "lmstudio" and method == "GET" and path.startswith("/api/v0/models/"):
+            model_id = urllib.parse.unquote(path[len("/api/v0/models/"):])
+            if not self.knows(model_id):
+                return None
+            return json.dumps({"id": model_id, "object": "model", "type": "llm", "state": "not-loaded",
+                               "max_context_length": 32768, "capabilities": ["tool_use"]}).encode()
+        return None
+
+    def native_routes(self):
+        """Backend-specific endpoints, so fingerprinting can tell an empty backend apart."""
+        if self.flavor == "ollama":
+            return {"/api/version": b'{"version":"0.6.8"}'}
+        if self.flavor == "lmstudio":
+            data = [{"id": i, "object": "model", "type": "llm", "state": "not-loaded", "max_context_length": 8192}
+                    for i in self.model_ids()]
+            return {"/api/v0/models": json.dumps({"object": "list", "data": data}).encode()}
+        return {"/props": b'{"default_generation_settings":{"n_ctx":8192},"total_slots":1}',
+                "/health": b'{"status":"ok"}'}
+
+
+COMPLETION = (b'data: {"object":"chat.completion.chunk","choices":[{"index":0,"delta":{"content":"Hi"}}]}\n\n'
+              b'data: [DONE]\n\n')
+
+
+def _response(status, body, keep_alive, content_type="application/json"):
+    reason = {200: "OK", 404: "Not Found", 500: "Internal Server Error"}[status]
+    head = (f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _serve_connection(reader, writer, backend, catalogs, routes, state):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, path = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ")[:2]
+            keep_alive = b"connection: close" not in head.lower()
+            length = re.search(rb"(?i)\r\ncontent-length:\s*(\d+)", head)
+            body = await reader.readexactly(int(length.group(1))) if length else b""
+            detail = backend.details(method, path.split("?")[0], body)
+            completion = None
+            if method == "POST" and path.split("?")[0] == "/v1/chat/completions":
+                model_id = json.loads(body or b"{}").get("model")
+                if backend.knows(model_id):
+                    completion = COMPLETION
+                    if model_id not in state["loaded"]:
+                        # Cold model: the first completion waits for it to load
+                        await asyncio.sleep(backend.load_ms / 1000)
+                        state["loaded"].add(model_id)
+            delay = backend.latency_ms + random.uniform(0, backend.jitter_ms)
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            content_type = "application/json"
+            if random.random() < backend.failure_rate:
+                # Half of the injected failures are HTTP 500s, half are dropped connections
+                if random.random() < 0.5:
+                    writer.transport.abort()
+                    return
+                status, body = 500, b'{"error":"injected failure"}'
+            elif completion is not None:
+                status, body, content_type = 200, completion, "text/event-stream"
+            elif detail is not None:
+                status, body = 200, detail
+            elif method == "GET" and path.split("?")[0] in routes:
+                status, body = 200, routes[path.split("?")[0]]
+            elif method == "GET" and (path.split("?")[0] in catalogs or path.split("?")[0].endswith("/models")):
+                bodies = catalogs.get(path.split("?")[0], catalogs["/models"])
+                status, body = 200, bodies[state["generation"] % len(bodies)]
+                state["generation"] += 1
+            else:
+                status, body = 404, b'{"error":"not found"}'
+            writer.write(_response(status, body, keep_alive, content_type))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(backends, ready):
+    rendered = {}
+    servers = []
+    ports = []
+    for backend in backends:
+        # Backends with identical catalogs share the rendered bodies
+        key = backend.catalog_key()
+        if key not in rendered:
+            generations = [backend.catalogs(0)]
+            if backend.churn:
+                generations.append(backend.catalogs(1))
+            rendered[key] = {path: [bodies[path] for bodies in generations] for path in generations[0]}
+        state = {"generation": 0, "loaded": set()}
+        handler = functools.partial(_serve_connection, backend=backend, catalogs=rendered[key],
+                                    routes=backend.native_routes(), state=state)
+        server = await asyncio.start_server(handler, backend.host, backend.port, backlog=1024)
+        servers.append(server)
+        ports.append(server.sockets[0].getsockname()[1])
+    ready(ports)
+    await asyncio.Event().wait()
+
+
+def _child(backends, conn):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def ready(ports):
+        conn.send(ports)
+        conn.close()
+
+    try:
+        asyncio.run(_serve(backends, ready))
+    except OSError as e:
+        # e.g. a default port already taken; reported by FakeFleet.start()
+        if not conn.closed:
+            conn.send(e)
+
+
+class FakeFleet:
+    """Runs a set of fake backends in a child process.
+
+    Use as a context manager; ``urls`` holds one /v1/models URL per backend.
+    """
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self.ports = []
+        self._process = None
+
+    def start(self, timeout=120):
+        parent, child = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_child, args=(self.backends, child), daemon=True)
+        self._process.start()
+        child.close()
+        if not parent.poll(timeout):
+            self.stop()
+            raise RuntimeError("fake servers did not start")
+        ports = parent.recv()
+        if isinstance(ports, Exception):
+            self.stop()
+            raise RuntimeError(f"fake servers did not start: {ports}")
+        self.ports = ports
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    @property
+    def urls(self):
+        return [f"http://{backend.host}:{port}/v1/models" for backend, port in zip(self.backends, self.ports)]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def fleet_spec(endpoints, models, subnet=None, **kwargs):
+    """`endpoints` backends, cycling through the three flavors.
+
+    With a ``subnet``, backend i listens on the subnet's i-th host address
+    on its flavor's default port; otherwise on a free port of 127.0.0.1.
+    """
+    hosts = list(ipaddress.ip_network(subnet, strict=False).hosts()) if subnet else None
+    if hosts is not None and endpoints > len(hosts):
+        raise ValueError(f"{subnet} has room for {len(hosts)} backends")
+    backends = []
+    for i in range(endpoints):
+        flavor = FLAVORS[i % len(FLAVORS)]
+        if hosts is not None:
+            kwargs.update(host=str(hosts[i]), port=DEFAULT_PORTS[flavor])
+        backends.append(Backend(flavor, models, **kwargs))
+    return backends
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--endpoints", type=int, default=3, help="number of fake backends (default: 3)")
+    parser.add_argument("--models", type=int, default=10, help="models per backend (default: 10)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="response delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra uniform random delay")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="share of requests that fail with HTTP 500 or a dropped connection")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="extra bytes per model entry")
+    parser.add_argument("--churn", type=float, default=0.0,
+                        help="share of models renamed on every other request")
+    parser.add_argument("--load-ms", type=float, default=0,
+                        help="extra delay of the first completion sent to each model (simulated load)")
+    parser.add_argument("--subnet", help="spread backends over this subnet's addresses on their default ports")
+
+
+def backends_from_args(args):
+    return fleet_spec(args.endpoints, args.models, subnet=args.subnet, latency_ms=args.latency_ms,
+                      jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+                      payload_bytes=args.payload_bytes, churn=args.churn, load_ms=args.load_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Ollama / LM Studio / llama.cpp model endpoints.")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    backends = backends_from_args(args)
+    with FakeFleet(backends) as fleet:
+        for backend, url in zip(backends, fleet.urls):
+            print(f"{backend.flavor:9} {url}")
+        sys.stdout.flush()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
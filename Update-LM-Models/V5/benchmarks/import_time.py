@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark for the headless path (mu --offline --quiet).
+
+Runs the updater in a throwaway HOME seeded with a small catalog cache and
+compares its wall time with a bare ``python -c pass``. Fails (exit 1) when
+the overhead exceeds the budget or when Rich / asyncio get imported on the
+headless path at all.
+
+    python3 benchmarks/import_time.py [--runs 15] [--budget-ms 80]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+V5_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(V5_DIR, "model_updater.py")
+FORBIDDEN = ("rich", "asyncio")
+
+
+def seed_home(home, models_per_endpoint=50):
+    """Creates opencode.json, the script config and a warm catalog cache."""
+    os.makedirs(os.path.join(home, ".config", "opencode"))
+    with open(os.path.join(home, ".config", "opencode", "opencode.json"), 'w') as f:
+        f.write("{}")
+    urls = {
+        "OLLAMA_URL": "http://127.0.0.1:9/v1/models",
+        "LMSTUDIO_URL": "http://127.0.0.1:9/v2/models",
+        "LLAMA_URL": "http://127.0.0.1:9/v3/models",
+    }
+    with open(os.path.join(home, ".update-models-config"), 'w') as f:
+        for key, value in urls.items():
+            f.write(f'{key}="{value}"\n')
+    os.makedirs(os.path.join(home, ".cache", "omnilink"))
+    cache = {
+        url: {"models": [f"model-{i}" for i in range(models_per_endpoint)], "fetched_at": time.time()}
+        for url in urls.values()
+    }
+    with open(os.path.join(home, ".cache", "omnilink", "catalogs.json"), 'w') as f:
+        json.dump(cache, f)
+
+
+def time_command(cmd, env, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def imported_modules(env):
+    """Top-level modules imported by the headless path, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", SCRIPT, "--offline", "--quiet"],
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=80,
+                        help="allowed overhead over a bare interpreter start (default: 80)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        seed_home(home)
+        env = dict(os.environ, HOME=home)
+        baseline = time_command([sys.executable, "-c", "pass"], env, args.runs)
+        headless = time_command([sys.executable, SCRIPT, "--offline", "--quiet"], env, args.runs)
+        leaked = sorted(set(FORBIDDEN) & imported_modules(env))
+
+    overhead_ms = (headless - baseline) * 1000
+    print(f"interpreter start:      {baseline * 1000:7.1f} ms (median of {args.runs})")
+    print(f"mu --offline --quiet:   {headless * 1000:7.1f} ms")
+    print(f"overhead:               {overhead_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    ok = True
+    if leaked:
+        print(f"FAIL: headless path imported {', '.join(leaked)}")
+        ok = False
+    if overhead_ms > args.budget_ms:
+        print("FAIL: cold start is over budget")
+        ok = False
+    if ok:
+        print("OK")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
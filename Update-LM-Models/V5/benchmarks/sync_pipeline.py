@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""End-to-end sync benchmark against local fake backends.
+
+Starts a fleet of stand-in Ollama / LM Studio / llama.cpp servers (see
+fakeservers.py), points a throwaway HOME at them and runs the real
+``mu --json`` repeatedly. Reports the first (cold) sync separately, then
+p50/p99 end-to-end latency, per-phase times and peak RSS of the steady
+state runs.
+
+    python3 benchmarks/sync_pipeline.py --preset small
+    python3 benchmarks/sync_pipeline.py --preset large --runs 5
+    python3 benchmarks/sync_pipeline.py --endpoints 50 --models 800 \\
+        --latency-ms 40 --jitter-ms 20 --failure-rate 0.05 --churn 0.01
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fakeservers import FakeFleet, add_backend_arguments, backends_from_args
+
+V5_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(V5_DIR, "model_updater.py")
+
+# Fleet shapes: (endpoints, models per endpoint)
+PRESETS = {
+    "small": (3, 10),
+    "medium": (20, 500),
+    "large": (200, 5000),
+}
+
+# Script config key prefix per fake backend flavor
+FLAVOR_KEYS = {"ollama": "OLLAMA", "lmstudio": "LMSTUDIO", "llamacpp": "LLAMA"}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def seed_home(home, backends, urls, instrument=False):
+    """Writes an empty opencode.json and a script config listing every fake backend."""
+    os.makedirs(os.path.join(home, ".config", "opencode"))
+    with open(os.path.join(home, ".config", "opencode", "opencode.json"), 'w') as f:
+        f.write("{}")
+    counts = {}
+    with open(os.path.join(home, ".update-models-config"), 'w') as f:
+        for backend, url in zip(backends, urls):
+            prefix = FLAVOR_KEYS[backend.flavor]
+            counts[prefix] = counts.get(prefix, 0) + 1
+            key = f"{prefix}_URL" if counts[prefix] == 1 else f"{prefix}_URL_{counts[prefix]}"
+            f.write(f'{key}="{url}"\n')
+        # Keep the cold run's backups from dominating disk usage on large fleets
+        f.write('BACKUP_KEEP="5"\n')
+        if instrument:
+            f.write(f'METRICS_FILE="{os.path.join(home, "omnilink.prom")}"\n')
+
+
+def run_sync(home):
+    """Runs one `mu --json`; returns (wall seconds, peak RSS bytes, summary dict or None)."""
+    env = dict(os.environ, HOME=home)
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SCRIPT, "--json"], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    out = proc.stdout.read()
+    proc.stdout.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    try:
+        summary = json.loads(out)
+    except ValueError:
+        summary = None
+    return wall, peak, summary
+
+
+def describe_run(wall, peak, summary):
+    if summary is None:
+        return f"{wall * 1000:9.1f} ms  {peak / 2**20:7.1f} MiB  (no summary)"
+    statuses = {}
+    for provider in summary["providers"]:
+        statuses[provider["status"]] = statuses.get(provider["status"], 0) + 1
+    changes = summary["changes"]
+    return (f"{wall * 1000:9.1f} ms  {peak / 2**20:7.1f} MiB  "
+            f"+{changes['added']} -{changes['removed']} ~{changes['renamed']}  "
+            f"details={summary.get('detail_requests', 0)}  "
+            + " ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+
+
+def report(first, runs):
+    walls = [wall for wall, _, _ in runs]
+    peaks = [peak for _, peak, _ in runs]
+    phases = {}
+    for _, _, summary in runs:
+        for name, ms in (summary or {}).get("timings_ms", {}).items():
+            phases.setdefault(name, []).append(ms)
+        for name, ms in (summary or {}).get("phases_ms", {}).items():
+            phases.setdefault(f"  {name}", []).append(ms)
+    failures = {}
+    for _, _, summary in [first] + runs:
+        for provider in (summary or {}).get("providers", []):
+            if provider["error"]:
+                failures[provider["error"]] = failures.get(provider["error"], 0) + 1
+
+    result = {
+        "first_sync_ms": round(first[0] * 1000, 1),
+        "first_sync_peak_rss_mib": round(first[1] / 2**20, 1),
+        "runs": len(runs),
+        "p50_ms": round(percentile(walls, 50) * 1000, 1),
+        "p99_ms": round(percentile(walls, 99) * 1000, 1),
+        "peak_rss_mib": round(max(peaks) / 2**20, 1),
+        "phases_p50_ms": {name: round(statistics.median(values), 1) for name, values in phases.items()},
+        "fetch_errors": failures,
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mu sync pipeline against fake backends.")
+    add_backend_arguments(parser)
+    parser.add_argument("--preset", choices=sorted(PRESETS),
+                        help="fleet shape; overrides --endpoints/--models")
+    parser.add_argument("--runs", type=int, default=10, help="steady-state runs after the first sync (default: 10)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="turn on mu's metrics export to break phases down into dns/connect/download/...")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if args.preset:
+        args.endpoints, args.models = PRESETS[args.preset]
+
+    backends = backends_from_args(args)
+    log = sys.stderr if args.json else sys.stdout
+    print(f"fleet: {args.endpoints} endpoints x {args.models} models, latency {args.latency_ms:g}"
+          f"+{args.jitter_ms:g} ms, failure rate {args.failure_rate:g}, payload {args.payload_bytes} B/model, "
+          f"churn {args.churn:g}", file=log)
+
+    with FakeFleet(backends) as fleet, tempfile.TemporaryDirectory() as home:
+        seed_home(home, backends, fleet.urls, args.instrument)
+        first = run_sync(home)
+        print(f"first sync  {describe_run(*first)}", file=log)
+        runs = []
+        for i in range(args.runs):
+            runs.append(run_sync(home))
+            print(f"run {i + 1:<6}  {describe_run(*runs[-1])}", file=log)
+
+    if not runs:
+        runs = [first]
+    result = report(first, runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print()
+    print(f"first sync:  {result['first_sync_ms']:9.1f} ms   peak RSS {result['first_sync_peak_rss_mib']:.1f} MiB")
+    print(f"p50:         {result['p50_ms']:9.1f} ms")
+    print(f"p99:         {result['p99_ms']:9.1f} ms   ({result['runs']} runs)")
+    print(f"peak RSS:    {result['peak_rss_mib']:9.1f} MiB")
+    for name, ms in result["phases_p50_ms"].items():
+        print(f"  {name + ':':<13}{ms:9.1f} ms (p50)")
+    if result["fetch_errors"]:
+        print("fetch errors: " + ", ".join(f"{kind}={count}" for kind, count in sorted(result["fetch_errors"].items())))
+
+
+if __name__ == "__main__":
+    main()
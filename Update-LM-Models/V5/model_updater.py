@@ -1,33 +1,82 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import os
+import re
 import sys
 import time
-import threading
-import urllib.request
-import urllib.error
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
-from rich.table import Table
-from rich.panel import Panel
-from rich.layout import Layout
-from rich.live import Live
-from rich.text import Text
+
+# Only cheap modules are imported up front. Rich, the asyncio-based fetch,
+# health and watch modules, and the locking and config-splicing modules are
+# imported where they are used, so headless (--json/--quiet) and --offline
+# runs start fast.
+from omnilink import metrics
+from omnilink.backups import BackupStore, DEFAULT_KEEP, DEFAULT_MAX_AGE_DAYS
+from omnilink.cache import CatalogCache, DetailCache, describe_age
+from omnilink.endpoints import URL_KEY_RE, endpoints_from_config
+from omnilink.reconcile import total_changes
 
 # Configuration Paths
 CONFIG_DIR = os.path.expanduser("~/.config/opencode")
 OPENCODE_CONFIG_FILE = os.path.join(CONFIG_DIR, "opencode.json")
 SCRIPT_CONFIG_FILE = os.path.expanduser("~/.update-models-config")
 
-# Initialize Rich Console
-console = Console()
+# Instrumented phases, in the order a sync goes through them
+PHASE_ORDER = ("lock", "dns", "connect", "download", "decode", "enrich", "read", "reconcile", "render", "backup", "write", "warm")
+
+class LazyConsole:
+    """Creates the Rich console the first time it is used."""
+
+    _console = None
+
+    def __getattr__(self, name):
+        global console
+        if self._console is None:
+            from rich.console import Console
+            LazyConsole._console = console = Console()
+        return getattr(self._console, name)
+
+class PlainConsole:
+    """Headless stand-in for the Rich console: plain text on stderr.
+
+    With ``quiet``, only errors (messages marked up in red) are printed.
+    Tables and other Rich renderables are dropped; headless callers print
+    their data as plain text or JSON instead.
+    """
+
+    MARKUP_RE = re.compile(r"\[(?:/|/?(?:(?:bold|dim|red|green|yellow|cyan|magenta|blue|white)\s*)+)\]")
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+
+    def print(self, message=""):
+        if not isinstance(message, str) or (self.quiet and "[red]" not in message):
+            return
+        print(self.MARKUP_RE.sub("", message), file=sys.stderr)
+
+# Initialize Rich Console (lazily)
+console = LazyConsole()
 
 def load_script_config():
     """Loads the script configuration (URLs) from ~/.update-models-config."""
     config = {
         "OLLAMA_URL": "http://localhost:11434/v1/models",
         "LMSTUDIO_URL": "http://localhost:1234/v1/models",
-        "LLAMA_URL": "http://localhost:8080/v1/models"
+        "LLAMA_URL": "http://localhost:8080/v1/models",
+        "OLLAMA_MODELS_DIR": "",
+        "LMSTUDIO_MODELS_DIR": "",
+        "LLAMA_MODELS_DIR": "",
+        "BACKUP_KEEP": str(DEFAULT_KEEP),
+        "BACKUP_MAX_AGE_DAYS": str(DEFAULT_MAX_AGE_DAYS),
+        "MAX_RESPONSE_MB": "64",
+        "DISCOVER_PORTS": "",
+        "METRICS_FILE": "",
+        "TRACE_FILE": "",
+        "ENRICH_MODELS": "1",
+        "TARGETS_FILE": "",
+        "WARM_MODELS": "0",
+        "WARM_PER_HOST": "1",
+        "WARM_TIMEOUT": "300"
     }
     if os.path.exists(SCRIPT_CONFIG_FILE):
         try:
@@ -37,7 +86,7 @@ def load_script_config():
                         key, value = line.strip().split('=', 1)
                         # Remove quotes if present
                         value = value.strip('"').strip("'")
-                        if key in config:
+                        if key in config or URL_KEY_RE.match(key):
                             config[key] = value
         except Exception as e:
             console.print(f"[red]Error loading script config: {e}[/red]")
@@ -52,107 +101,738 @@ def save_script_config(config):
     except Exception as e:
         console.print(f"[red]Error saving script config: {e}[/red]")
 
-def fetch_models(url, name):
-    """Fetches models from a given URL."""
-    try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=5) as response:
-            if response.status == 200:
-                data = json.loads(response.read().decode())
-                if 'data' in data and isinstance(data['data'], list):
-                    return [model['id'] for model in data['data']]
-    except (urllib.error.URLError, TimeoutError, ConnectionRefusedError):
+def failure_status(error, label="Failed"):
+    """Rich markup describing why an endpoint produced no models."""
+    if error == "circuit-open":
+        return "[yellow]Skipped (circuit open)[/yellow]"
+    if error == "deadline-skipped":
+        return "[yellow]Skipped (deadline reached)[/yellow]"
+    if error:
+        return f"[red]{label} ({error})[/red]"
+    return f"[red]{label}[/red]"
+
+def endpoint_status(ep, results):
+    """Classifies an endpoint's outcome as updated, cached, skipped or failed."""
+    if results.get(ep.key) is not None and f"{ep.key}_STALE" in results:
+        return "cached"
+    if results.get(ep.key):
+        return "updated"
+    if results.get(f"{ep.key}_ERROR") in ("circuit-open", "deadline-skipped"):
+        return "skipped"
+    return "failed"
+
+def build_summary(endpoints, results, timings, diffs, written, phases, detail_requests=0, outcomes=None,
+                  warmed=None):
+    """Machine-readable run summary printed by --json."""
+    from omnilink.lock import stats as lock_stats
+
+    providers = []
+    for ep in endpoints:
+        diff = diffs.get(ep.provider_key)
+        entry = {
+            "key": ep.key,
+            "provider": ep.provider_key,
+            "label": ep.label,
+            "url": ep.url,
+            "status": endpoint_status(ep, results),
+            "models": len(results.get(ep.key) or []),
+            "elapsed_ms": round(timings[ep.key] * 1000, 1) if ep.key in timings else None,
+            "error": results.get(f"{ep.key}_ERROR"),
+            "diff": diff.summary() if diff is not None else None,
+        }
+        if f"{ep.key}_STALE" in results:
+            entry["cached_at"] = results[f"{ep.key}_STALE"]
+        providers.append(entry)
+    summary = {
+        "config": OPENCODE_CONFIG_FILE if outcomes is None else None,
+        "written": written,
+        "changes": total_changes(diffs),
+        "detail_requests": detail_requests,
+        "providers": providers,
+        "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in phases.items()},
+    }
+    summary["locks"] = {name: {"acquired": entry["acquired"], "contended": entry["contended"],
+                               "coalesced": entry["coalesced"], "waited_ms": round(entry["waited"] * 1000, 1)}
+                        for name, entry in lock_stats().items()}
+    if warmed is not None:
+        summary["warmed"] = warmed
+    if outcomes is not None:
+        summary["targets"] = [{"path": o["path"], "written": o["written"], "error": o["error"],
+                               "changes": total_changes(o["diffs"])} for o in outcomes]
+    if metrics.recorder() is not None:
+        summary["phases_ms"] = {name: round(seconds * 1000, 1)
+                                for name, (seconds, _) in metrics.recorder().phase_totals().items()}
+    return summary
+
+def print_summary(endpoints, results, timings, updated_providers, removed_count, written, history=True,
+                  profiles=None):
+    """Prints the per-endpoint summary table and the overall outcome.
+
+    With a ProfileStore, a column shows each provider's slowest-loading model.
+    """
+    from rich.table import Table
+
+    rows = []
+    for ep in endpoints:
+        elapsed = f"{timings[ep.key] * 1000:.0f} ms" if ep.key in timings else "-"
+        error = results.get(f"{ep.key}_ERROR")
+        status = endpoint_status(ep, results)
+        if status == "cached":
+            age = describe_age(results[f"{ep.key}_STALE"])
+            reason = f", {error}" if error else ""
+            rows.append([ep.label, f"[yellow]Cached ({age} old{reason})[/yellow]", str(len(results[ep.key])), elapsed])
+        elif status == "updated":
+            rows.append([ep.label, "[green]Updated[/green]", str(len(results[ep.key])), elapsed])
+        else:
+            rows.append([ep.label, failure_status(error, "Failed/Skipped"), "0", elapsed])
+        slowest = profiles.slowest(ep.url, results.get(ep.key)) if profiles is not None else None
+        rows[-1].append(f"{slowest[1] / 1000:.1f} s ({slowest[0]})" if slowest else "-")
+
+    table = Table(title="Update Summary")
+    table.add_column("Provider", style="cyan")
+    table.add_column("Status", style="green")
+    table.add_column("Models Found", justify="right")
+    table.add_column("Time", justify="right")
+    if any(row[-1] != "-" for row in rows):
+        table.add_column("Slowest Load", justify="right")
+    else:
+        rows = [row[:-1] for row in rows]
+    for row in rows:
+        table.add_row(*row)
+
+    console.print(table)
+    print_phases()
+    print_locks()
+
+    if removed_count > 0:
+        console.print(f"\n[yellow]Removed {removed_count} models that are no longer available.[/yellow]")
+
+    if not updated_providers:
+        console.print("\n[red]No providers were updated. Please check your connections.[/red]")
+    elif not written:
+        console.print("\n[bold green]OpenCode configuration is already up to date.[/bold green]")
+    else:
+        console.print("\n[bold green]Success! OpenCode configuration has been updated.[/bold green]")
+        console.print("Restart OpenCode and run [bold]/models[/bold] to see your new models.")
+        if history:
+            console.print("Run [bold]mu history[/bold] / [bold]mu rollback[/bold] to undo.")
+
+def print_targets(outcomes):
+    """Per-target outcome table for a fan-out sync."""
+    from rich.table import Table
+
+    table = Table(title="Sync Targets")
+    table.add_column("Config", style="cyan")
+    table.add_column("Status")
+    table.add_column("Changes", justify="right")
+    for outcome in outcomes:
+        changes = total_changes(outcome["diffs"])
+        if outcome["error"]:
+            status = f"[red]Failed ({outcome['error']})[/red]"
+        elif outcome["written"]:
+            status = "[green]Updated[/green]"
+        else:
+            status = "Up to date"
+        table.add_row(outcome["path"], status, f"+{changes['added']} -{changes['removed']} ~{changes['renamed']}")
+    console.print(table)
+
+def print_warmup(warmed):
+    """Per-model outcome of the warm-up stage."""
+    from rich.table import Table
+
+    table = Table(title="Warm-up")
+    table.add_column("Provider", style="cyan")
+    table.add_column("Model")
+    table.add_column("Load", justify="right")
+    table.add_column("TTFT (cold)", justify="right")
+    table.add_column("TTFT (warm)", justify="right")
+    for outcome in warmed:
+        if outcome["error"]:
+            table.add_row(outcome["provider"], outcome["model"], f"[red]Failed ({outcome['error']})[/red]", "-", "-")
+        else:
+            table.add_row(outcome["provider"], outcome["model"], f"{outcome['load_ms'] / 1000:.1f} s",
+                          f"{outcome['ttft_ms']:.0f} ms", f"{outcome['warm_ttft_ms']:.0f} ms")
+    console.print(table)
+
+def print_phases():
+    """One line of per-phase timings when instrumentation is on."""
+    if metrics.recorder() is None:
+        return
+    totals = metrics.recorder().phase_totals()
+    parts = [f"{name} {totals[name][0] * 1000:.0f} ms" for name in PHASE_ORDER if name in totals]
+    if parts:
+        console.print("[dim]Time spent: " + " · ".join(parts) + " (summed over endpoints)[/dim]")
+
+def print_locks():
+    """Notes time spent waiting for other mu runs, if there was any."""
+    from omnilink.lock import stats as lock_stats
+
+    for name, entry in lock_stats().items():
+        if not entry["contended"]:
+            continue
+        if name == "fetch":
+            outcome = "reused its results" if entry["coalesced"] else "then fetched anyway"
+            console.print(f"[dim]Waited {entry['waited']:.1f} s for another mu run's fetch, {outcome}.[/dim]")
+        else:
+            console.print(f"[dim]Waited {entry['waited']:.1f} s for another mu run writing the config "
+                          f"({entry['contended']} of {entry['acquired']} write(s)).[/dim]")
+
+def start_metrics(args, config):
+    """Enables instrumentation if --metrics/--trace or METRICS_FILE/TRACE_FILE is set.
+
+    Returns the ``(metrics_file, trace_file)`` to export to, or None.
+    """
+    metrics_file = args.metrics or config["METRICS_FILE"]
+    trace_file = args.trace or config["TRACE_FILE"]
+    if not metrics_file and not trace_file:
         return None
-    except Exception:
+    metrics.enable()
+    return (os.path.expanduser(metrics_file) if metrics_file else None,
+            os.path.expanduser(trace_file) if trace_file else None)
+
+def export_metrics(exports):
+    """Writes the .prom and trace files, then starts a fresh recording."""
+    if not exports or metrics.recorder() is None:
+        return
+    metrics_file, trace_file = exports
+    try:
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
+        if trace_file:
+            metrics.write_trace(trace_file)
+    except Exception as e:
+        console.print(f"[red]Error writing metrics: {e}[/red]")
+    metrics.recorder().reset()
+
+def max_response_size(config):
+    """Per-catalog response limit in bytes, from MAX_RESPONSE_MB."""
+    try:
+        return int(float(config["MAX_RESPONSE_MB"]) * 1024 * 1024)
+    except ValueError:
+        console.print("[red]Invalid MAX_RESPONSE_MB setting, using the default.[/red]")
+        from omnilink.fetch import DEFAULT_MAX_RESPONSE
+        return DEFAULT_MAX_RESPONSE
+
+def fetch_results(endpoints, cache, on_result=None, max_size=None):
+    """Fetches every endpoint, falling back to cached catalogs for failures.
+
+    Fetches are single-flight: while another mu run is fetching, this one
+    waits and reuses its results. ``on_result`` is then called for every
+    endpoint with an ``elapsed`` of None.
+    """
+    from omnilink.lock import SingleFlight
+
+    def fetch():
+        from omnilink.fetch import DEFAULT_MAX_RESPONSE, fetch_all
+        from omnilink.health import HealthStore
+
+        # Health records shorten timeouts and skip hosts that keep failing
+        health = HealthStore().load()
+        results = fetch_all(endpoints, on_result=on_result, health=health, validators=cache.entries,
+                            max_size=max_size or DEFAULT_MAX_RESPONSE)
+        health.save()
+
+        # Failed endpoints fall back to their last known good catalog
+        cache.fill_stale(results, endpoints)
+        cache.save()
+        return results
+
+    results, coalesced = SingleFlight().run(sorted(ep.url for ep in endpoints), fetch)
+    if coalesced and on_result is not None:
+        for ep in endpoints:
+            on_result(ep, results.get(ep.key), None, results.get(f"{ep.key}_ERROR"))
+    return results
+
+def enrichment_enabled(config):
+    return config["ENRICH_MODELS"].strip().lower() not in ("0", "no", "false", "off", "")
+
+def enrich_results(config, endpoints, results):
+    """Adds model details (context length, tools, ...) to ``results``.
+
+    Only models not in the details cache are inspected. Returns the number
+    of detail requests made.
+    """
+    if not enrichment_enabled(config):
+        return 0
+    from omnilink.enrich import enrich
+
+    details = DetailCache().load()
+    requests = enrich(endpoints, results, details)
+    details.save()
+    return requests
+
+def warming_enabled(args, config):
+    return args.warm or config["WARM_MODELS"].strip().lower() not in ("0", "no", "false", "off", "")
+
+def added_models(endpoints, results, diffs):
+    """``(endpoint, model id)`` for every model this sync added, each once; cached catalogs are left out."""
+    added = []
+    for ep in endpoints:
+        if f"{ep.key}_STALE" in results:
+            continue
+        models = {}
+        for key, diff in diffs.items():
+            # Fan-out diffs are keyed <path>:<provider key>
+            if key == ep.provider_key or key.endswith(":" + ep.provider_key):
+                models.update(dict.fromkeys(diff.added))
+        added += [(ep, model_id) for model_id in models]
+    return added
+
+def warm_models(config, models):
+    """Warms ``models`` and records their load profiles; returns the outcomes."""
+    if not models:
+        return []
+    from omnilink.profiles import ProfileStore
+    from omnilink.warm import DEFAULT_TIMEOUT, PER_HOST_CONCURRENCY, warm
+
+    try:
+        per_host = max(1, int(config["WARM_PER_HOST"]))
+        timeout = float(config["WARM_TIMEOUT"])
+    except ValueError:
+        console.print("[red]Invalid WARM_PER_HOST / WARM_TIMEOUT settings, using defaults.[/red]")
+        per_host, timeout = PER_HOST_CONCURRENCY, DEFAULT_TIMEOUT
+    profiles = ProfileStore().load()
+    warmed = warm(models, profiles=profiles, per_host=per_host, timeout=timeout)
+    profiles.save()
+    return warmed
+
+def open_profiles():
+    """The load profiles recorded by earlier warm-ups, or None if there are none yet."""
+    from omnilink.profiles import DEFAULT_PROFILE_FILE, ProfileStore
+
+    return ProfileStore().load() if os.path.exists(DEFAULT_PROFILE_FILE) else None
+
+def run_offline(config, targets=None):
+    """Rebuilds opencode.json (or every target) purely from the catalog cache, without any network I/O."""
+    endpoints = endpoints_from_config(config)
+    results = CatalogCache().load().results(endpoints)
+    if enrichment_enabled(config):
+        DetailCache().load().fill(endpoints, results)
+    updated_providers, diffs, written, outcomes = sync_results(results, config, targets)
+    if outcomes is not None:
+        print_targets(outcomes)
+    print_summary(endpoints, results, {}, updated_providers, total_changes(diffs)["removed"], written,
+                  history=outcomes is None, profiles=open_profiles())
+
+def run_headless(args, targets=None):
+    """Cron/CI sync: never imports Rich or prompts; prints a JSON summary with --json.
+
+    Returns the process exit status: 0 when at least one provider was
+    reconciled and no sync target failed, 1 otherwise.
+    """
+    start = time.perf_counter()
+    phases = {}
+    timings = {}
+    config = load_script_config()
+    endpoints = endpoints_from_config(config)
+    cache = CatalogCache().load()
+
+    detail_requests = 0
+    if args.offline:
+        results = cache.results(endpoints)
+        if enrichment_enabled(config):
+            DetailCache().load().fill(endpoints, results)
+    else:
+        def on_result(ep, models, elapsed, error):
+            if elapsed is not None:
+                timings[ep.key] = elapsed
+
+        results = fetch_results(endpoints, cache, on_result, max_response_size(config))
+        phases["fetch"] = time.perf_counter() - start
+        enrich_start = time.perf_counter()
+        detail_requests = enrich_results(config, endpoints, results)
+        phases["enrich"] = time.perf_counter() - enrich_start
+
+    update_start = time.perf_counter()
+    updated_providers, diffs, written, outcomes = sync_results(results, config, targets)
+    phases["update"] = time.perf_counter() - update_start
+    warmed = None
+    if warming_enabled(args, config) and not args.offline:
+        warm_start = time.perf_counter()
+        warmed = warm_models(config, added_models(endpoints, results, diffs))
+        phases["warm"] = time.perf_counter() - warm_start
+    phases["total"] = time.perf_counter() - start
+
+    failed_targets = [outcome for outcome in outcomes or [] if outcome["error"]]
+    for outcome in failed_targets:
+        console.print(f"[red]Error syncing {outcome['path']}: {outcome['error']}[/red]")
+    if args.json:
+        print(json.dumps(build_summary(endpoints, results, timings, diffs, written, phases, detail_requests,
+                                       outcomes, warmed), indent=2))
+    return 0 if updated_providers and not failed_targets else 1
+
+def open_backup_store(config):
+    """Returns the backup store configured by BACKUP_KEEP / BACKUP_MAX_AGE_DAYS."""
+    try:
+        return BackupStore(keep=int(config["BACKUP_KEEP"]), max_age_days=float(config["BACKUP_MAX_AGE_DAYS"]))
+    except ValueError:
+        console.print("[red]Invalid backup retention settings, using defaults.[/red]")
+        return BackupStore()
+
+def open_targets(args, config):
+    """Loads the --targets / TARGETS_FILE list, or returns None for the single default config."""
+    path = args.targets or config["TARGETS_FILE"]
+    if not path:
         return None
-    return None
+    from omnilink.targets import load_targets
 
-def update_opencode_config(fetched_models):
-    """Updates the OpenCode configuration file with fetched models."""
+    try:
+        targets = load_targets(path)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error loading targets file {path}: {e}[/red]")
+        sys.exit(1)
+    if not targets:
+        console.print(f"[red]Targets file {path} lists no targets.[/red]")
+        sys.exit(1)
+    return targets
+
+def target_backups(config):
+    """Returns ``target -> BackupStore`` honouring BACKUP_KEEP / BACKUP_MAX_AGE_DAYS."""
+    store = open_backup_store(config)
+    return lambda target: target.backups(store.keep, store.max_age_days)
+
+def sync_results(results, config, targets=None, backups=None):
+    """Reconciles ``results`` into opencode.json, or into every sync target in parallel.
+
+    Returns the updated provider names, the diffs, whether anything was
+    written and the per-target outcomes (None without targets). With
+    targets, diffs are keyed ``<path>:<provider key>``.
+    """
+    if targets is None:
+        return (*update_opencode_config(results, backups or open_backup_store(config)), None)
+    from omnilink.targets import sync_targets
+
+    outcomes = sync_targets(targets, results, target_backups(config))
+    updated_providers = []
+    diffs = {}
+    for outcome in outcomes:
+        updated_providers += [name for name in outcome["providers"] if name not in updated_providers]
+        diffs.update((f"{outcome['path']}:{key}", diff) for key, diff in outcome["diffs"].items())
+    return updated_providers, diffs, any(outcome["written"] for outcome in outcomes), outcomes
+
+def update_opencode_config(fetched_models, backups=None):
+    """Updates the OpenCode configuration file with fetched models.
+
+    Returns the updated provider names, the per-provider diffs and whether
+    the file was actually rewritten.
+    """
     if not os.path.exists(OPENCODE_CONFIG_FILE):
         console.print(f"[red]OpenCode config file not found at {OPENCODE_CONFIG_FILE}[/red]")
-        return [], 0
+        return [], {}, False
+    from omnilink.cache import LayoutCache
+    from omnilink.lock import LockTimeout, config_lock
 
+    # Held across read-modify-write so concurrent runs can't lose each other's updates
+    try:
+        lock = config_lock(OPENCODE_CONFIG_FILE).acquire()
+    except (LockTimeout, OSError) as e:
+        console.print(f"[red]Error locking OpenCode config: {e}[/red]")
+        return [], {}, False
+    layouts = LayoutCache().load()
     try:
-        with open(OPENCODE_CONFIG_FILE, 'r') as f:
-            opencode_config = json.load(f)
+        return _update_locked(fetched_models, backups, layouts)
+    finally:
+        layouts.save()
+        lock.release()
+
+def _update_locked(fetched_models, backups, layouts):
+    from omnilink.splice import read_document
+
+    try:
+        document = read_document(OPENCODE_CONFIG_FILE, layouts)
     except Exception as e:
         console.print(f"[red]Error reading OpenCode config: {e}[/red]")
-        return [], 0
+        return [], {}, False
 
-    total_removed = 0
-    updated_providers = []
+    with document:
+        updated_providers, diffs = document.reconcile(fetched_models)
+        changes = total_changes(diffs)
+        metrics.count("syncs")
 
-    if 'provider' not in opencode_config:
-        opencode_config['provider'] = {}
+        # Only changed model lists are rewritten; backup and save are skipped when nothing changed
+        try:
+            written = document.save(OPENCODE_CONFIG_FILE, backups, changes, layouts)
+        except Exception as e:
+            console.print(f"[red]Error saving OpenCode config: {e}[/red]")
+            return [], {}, False
+
+    if written:
+        metrics.count_changes(diffs)
+    return updated_providers, diffs, written
+
+def show_history(backups):
+    """Prints the recorded opencode.json writes, newest first."""
+    entries = backups.history()
+    if not entries:
+        console.print("[yellow]No backups recorded yet.[/yellow]")
+        return
+    rows = []
+    for n, entry in enumerate(entries, 1):
+        changes = entry.get("changes")
+        summary = f"+{changes['added']} -{changes['removed']} ~{changes['renamed']}" if changes else "-"
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+        rows.append((str(n), when, entry.get("action", "sync"), summary, f"{entry['size']} B"))
+    if isinstance(console, PlainConsole):
+        for row in rows:
+            print("\t".join(row))
+        return
+    from rich.table import Table
+
+    table = Table(title="Configuration History")
+    table.add_column("#", justify="right", style="cyan")
+    table.add_column("When")
+    table.add_column("Action")
+    table.add_column("Changes")
+    table.add_column("Size", justify="right")
+    for row in rows:
+        table.add_row(*row)
+    console.print(table)
+    console.print("Run [bold]mu rollback <#>[/bold] to restore the config as it was before that write.")
 
-    # Map internal keys to config keys and friendly names
-    provider_map = {
-        "OLLAMA": ("ollama", "Ollama (remote)"),
-        "LMSTUDIO": ("lmstudio", "LM Studio (remote)"),
-        "LLAMA": ("llamacpp", "Llama.cpp (remote)")
-    }
+def rollback(backups, n):
+    """Restores opencode.json to how it was before the n-th most recent write."""
+    from omnilink.lock import LockTimeout, config_lock
 
-    for key, (provider_key, provider_name) in provider_map.items():
-        if key in fetched_models and fetched_models[key] is not None:
-            models = fetched_models[key]
-            base_url = fetched_models[f"{key}_BASE"]
-            
-            updated_providers.append(provider_name.split(' ')[0])
-
-            if provider_key not in opencode_config['provider']:
-                opencode_config['provider'][provider_key] = {
-                    "npm": "@ai-sdk/openai-compatible",
-                    "name": provider_name,
-                    "options": {"baseURL": base_url},
-                    "models": {}
-                }
-            
-            # Remove non-present models
-            current_models = list(opencode_config['provider'][provider_key]['models'].keys())
-            for model in current_models:
-                if model not in models:
-                    del opencode_config['provider'][provider_key]['models'][model]
-                    total_removed += 1
-            
-            # Add/Update models
-            for model_id in models:
-                friendly_name = model_id
-                if provider_key == 'ollama' and ':cloud' in model_id:
-                    base_name = model_id.split(':')[0].replace('-', ' ').title()
-                    friendly_name = base_name + " Cloud"
-                else:
-                    friendly_name = model_id.replace('-', ' ').replace('/', ' ').title()
-                
-                opencode_config['provider'][provider_key]['models'][model_id] = {"name": friendly_name}
-
-    # Backup
-    backup_file = f"{OPENCODE_CONFIG_FILE}.backup.{int(time.time())}"
     try:
-        with open(OPENCODE_CONFIG_FILE, 'r') as src, open(backup_file, 'w') as dst:
-            dst.write(src.read())
-    except Exception:
-        pass # Fail silently on backup
+        # Locked like a sync, so a concurrent sync can't overwrite the restore or the backup index
+        with config_lock(OPENCODE_CONFIG_FILE):
+            entry, changed = backups.rollback(OPENCODE_CONFIG_FILE, n)
+    except (IndexError, LockTimeout, OSError) as e:
+        console.print(f"[red]Rollback failed: {e}[/red]")
+        return False
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+    if changed:
+        console.print(f"[bold green]Restored OpenCode configuration from before {when}.[/bold green]")
+    else:
+        console.print(f"[green]OpenCode configuration already matches the version from before {when}.[/green]")
+    return True
+
+def run_discover(args):
+    """Scans subnets for backends and adds the ones found to the script config.
+
+    Returns False when nothing was found or the arguments were invalid.
+    """
+    from omnilink.discover import DEFAULT_CONCURRENCY, DEFAULT_CONNECT_TIMEOUT, DEFAULT_PORTS, add_to_config, discover
+    from omnilink.endpoints import PROVIDERS
 
-    # Save
+    config = load_script_config()
+    # On first run the built-in localhost defaults are replaced, not kept alongside
+    replace = args.replace or not os.path.exists(SCRIPT_CONFIG_FILE)
     try:
-        with open(OPENCODE_CONFIG_FILE, 'w') as f:
-            json.dump(opencode_config, f, indent=2)
-    except Exception as e:
-        console.print(f"[red]Error saving OpenCode config: {e}[/red]")
-        return [], 0
+        extra = [int(port) for port in (args.ports or config["DISCOVER_PORTS"]).replace(" ", "").split(",") if port]
+    except ValueError:
+        console.print("[red]Ports must be a comma-separated list of numbers.[/red]")
+        return False
+    ports = list(dict.fromkeys(DEFAULT_PORTS + tuple(extra)))
+
+    console.print(f"Scanning {', '.join(args.cidr)} on port(s) {', '.join(map(str, ports))}...")
+    start = time.perf_counter()
+    try:
+        found = discover(args.cidr, ports=ports, timeout=args.timeout or DEFAULT_CONNECT_TIMEOUT,
+                         concurrency=args.concurrency or DEFAULT_CONCURRENCY)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return False
+    elapsed = time.perf_counter() - start
+
+    added = dict((url, key) for key, url in add_to_config(config, found, replace))
+    if added and not args.dry_run:
+        save_script_config(config)
 
-    return updated_providers, total_removed
+    if args.json:
+        entries = [dict(entry, key=added.get(entry["url"])) for entry in found]
+        print(json.dumps({"elapsed_ms": round(elapsed * 1000, 1), "saved": bool(added) and not args.dry_run,
+                          "found": entries}, indent=2))
+        return bool(found)
+    if not found:
+        console.print(f"[yellow]No backends found ({elapsed:.1f}s).[/yellow]")
+        return False
+    if isinstance(console, PlainConsole):
+        # --quiet: the exit status says whether anything was found
+        return True
+
+    from rich.table import Table
+
+    table = Table(title=f"Discovered Backends ({elapsed:.1f}s)")
+    table.add_column("Address", style="cyan")
+    table.add_column("Backend")
+    table.add_column("Models", justify="right")
+    table.add_column("Config")
+    for entry in found:
+        address = entry["url"][len("http://"):-len("/v1/models")]
+        if entry["provider"] is None:
+            backend, key = "[dim]OpenAI-compatible (unknown)[/dim]", "[dim]not added[/dim]"
+        else:
+            backend = PROVIDERS[entry["provider"]].label
+            if entry["how"] == "port":
+                backend += " [dim](guessed from port)[/dim]"
+            key = added.get(entry["url"], "[dim]already configured[/dim]")
+        table.add_row(address, backend, str(entry["models"]), key)
+    console.print(table)
+    if added and args.dry_run:
+        console.print("[yellow]Dry run: ~/.update-models-config was not changed.[/yellow]")
+    elif added:
+        console.print(f"[green]Added {len(added)} endpoint(s) to ~/.update-models-config.[/green] Run [bold]mu[/bold] to sync them.")
+    return True
+
+def print_banner(title):
+    if isinstance(console, PlainConsole):
+        return
+    from rich.panel import Panel
+
+    console.print(Panel.fit(f"[bold blue]{title}[/bold blue]", border_style="blue"))
+
+def run_watch(config, min_interval=None, max_interval=None, exports=None, targets=None):
+    """Keeps opencode.json (or every target) in sync until interrupted, writing only on change."""
+    from omnilink.localfs import local_sources
+    from omnilink.watch import ConfigState, DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, FanoutState, watch
+
+    print_banner("OpenCode Model Updater V5 - watch mode")
+    for path in [target.path for target in targets] if targets else [OPENCODE_CONFIG_FILE]:
+        if not os.path.exists(path):
+            console.print(f"[red]OpenCode config file not found at {path}[/red]")
+            sys.exit(1)
+
+    endpoints = endpoints_from_config(config)
+    if targets:
+        state = FanoutState(targets, target_backups(config))
+    else:
+        state = ConfigState(OPENCODE_CONFIG_FILE, open_backup_store(config))
+    cache = CatalogCache().load()
+    details = DetailCache().load() if enrichment_enabled(config) else None
+    sources = local_sources(config, endpoints)
+    unconfirmed = [ep for ep in endpoints if ep.key in sources and not sources[ep.key].confirmed]
+    if unconfirmed:
+        # A guessed model directory is only followed if it matches what the server reports
+        from omnilink.fetch import fetch_all
+
+        fetched = fetch_all(unconfirmed, validators=cache.entries, max_size=max_response_size(config))
+        for ep in unconfirmed:
+            if not sources[ep.key].confirm(fetched.get(ep.key)):
+                console.print(f"[yellow]{ep.label}: {sources[ep.key].path} doesn't match the server's models; "
+                              f"polling instead (set {ep.provider}_MODELS_DIR to follow a directory).[/yellow]")
+                del sources[ep.key]
+    for ep in endpoints:
+        if ep.key in sources:
+            mode = "reading manifests" if sources[ep.key].direct else "polled, refreshed early on change"
+            console.print(f"[dim]{ep.label}: following {sources[ep.key].path} ({mode})[/dim]")
+
+    def on_event(ep, models, diffs, written):
+        stamp = time.strftime("%H:%M:%S")
+        style = ep.adapter.style
+        if models is None:
+            console.print(f"[dim]{stamp}[/dim] [{style}]{ep.label}[/{style}]: [red]unreachable, backing off[/red]")
+        elif not diffs:
+            console.print(f"[dim]{stamp}[/dim] [{style}]{ep.label}[/{style}]: [green]back online ({len(models)} models)[/green]")
+        else:
+            changes = total_changes(diffs)
+            summary = f"+{changes['added']} -{changes['removed']} ~{changes['renamed']}"
+            status = "[green]config written[/green]" if written else "no changes"
+            console.print(f"[dim]{stamp}[/dim] [{style}]{ep.label}[/{style}]: {len(models)} models ({summary}), {status}")
+            cache.save()
+        export_metrics(exports)
+
+    def on_error(ep, e):
+        console.print(f"[dim]{time.strftime('%H:%M:%S')}[/dim] [red]Error updating OpenCode config for {ep.label}: {e}[/red]")
+
+    into = f" into {len(targets)} config(s)" if targets else ""
+    console.print(f"Watching {len(endpoints)} endpoint(s){into}. Press Ctrl+C to stop.")
+    watch(endpoints, state, on_event=on_event, on_error=on_error,
+          min_interval=min_interval or DEFAULT_MIN_INTERVAL,
+          max_interval=max_interval or DEFAULT_MAX_INTERVAL, sources=sources,
+          validators=cache.entries, initial=cache.results(endpoints), max_size=max_response_size(config),
+          details=details)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="mu", description="Sync local LLM backends into OpenCode.")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and sync whenever a backend's catalog changes")
+    parser.add_argument("--offline", action="store_true",
+                        help="rebuild opencode.json from the last known catalogs without contacting any backend")
+    parser.add_argument("--json", action="store_true",
+                        help="headless: no TUI or prompts, print a JSON summary (for cron/CI)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="headless: no TUI or prompts, only errors on stderr; exit status 1 if nothing synced")
+    parser.add_argument("--warm", action="store_true",
+                        help="after syncing, load each newly added model with a one-token completion "
+                             "and record its load time (not with --watch or --offline)")
+    parser.add_argument("--targets", metavar="FILE",
+                        help="sync every opencode.json listed in this JSON file instead of the default one")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write timings and counters as a Prometheus textfile-collector .prom file")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome trace-event JSON of the sync phases")
+    parser.add_argument("--min-interval", type=float,
+                        help="watch: seconds between polls after a change (default: 5)")
+    parser.add_argument("--max-interval", type=float,
+                        help="watch: longest back-off for stable or unreachable backends (default: 300)")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("history", help="list recorded opencode.json versions")
+    discover_parser = commands.add_parser("discover", help="scan subnets for backends and add them to the config")
+    discover_parser.add_argument("cidr", nargs="+", help="subnet(s) or addresses to scan, e.g. 192.168.1.0/24")
+    discover_parser.add_argument("--ports",
+                                 help="extra comma-separated ports to scan besides the backends' defaults")
+    discover_parser.add_argument("--timeout", type=float, help="seconds per connect attempt (default: 0.5)")
+    discover_parser.add_argument("--concurrency", type=int, help="connects in flight at once (default: 256)")
+    discover_parser.add_argument("--replace", action="store_true",
+                                 help="replace every configured URL with what was found")
+    discover_parser.add_argument("--dry-run", action="store_true", help="show what was found without saving it")
+    rollback_parser = commands.add_parser("rollback", help="restore opencode.json from history")
+    rollback_parser.add_argument("n", type=int, nargs="?", default=1,
+                                 help="undo back to before the n-th most recent write (default: 1)")
+    return parser.parse_args(argv)
 
 def main():
+    global console
+    args = parse_args()
+    headless = args.json or args.quiet
+    if headless:
+        console = PlainConsole(quiet=args.quiet)
+
+    if args.command == "history":
+        backups = open_backup_store(load_script_config())
+        if args.json:
+            print(json.dumps(backups.history(), indent=2))
+        else:
+            show_history(backups)
+        return
+    if args.command == "discover":
+        if not run_discover(args):
+            sys.exit(1)
+        return
+    if args.command == "rollback":
+        if not rollback(open_backup_store(load_script_config()), args.n):
+            sys.exit(1)
+        return
+
+    exports = start_metrics(args, load_script_config())
+    try:
+        run(args, headless, exports)
+    finally:
+        export_metrics(exports)
+
+def run(args, headless, exports):
+    """Runs one sync in the mode selected on the command line."""
+    targets = open_targets(args, load_script_config())
+    if args.watch:
+        # Daemon mode never prompts; unconfigured providers use their defaults
+        run_watch(load_script_config(), args.min_interval, args.max_interval, exports, targets)
+        return
+    if headless:
+        sys.exit(run_headless(args, targets))
+    if args.offline:
+        run_offline(load_script_config(), targets)
+        return
+
     console.clear()
-    console.print(Panel.fit("[bold blue]OpenCode Model Updater V5[/bold blue]", border_style="blue"))
+    print_banner("OpenCode Model Updater V5")
 
     config = load_script_config()
     
     # Check if we need to prompt for configuration (first run or missing)
     if not os.path.exists(SCRIPT_CONFIG_FILE):
         console.print("[yellow]Configuration not found. Let's set it up.[/yellow]")
+        console.print("[dim]Tip: Ctrl+C and run [bold]mu discover 192.168.1.0/24[/bold] to find backends on your network instead.[/dim]")
         
         # Ollama
         choice = console.input("For [bold]Ollama[/bold]: Run on same PC (local) or network? [local/network]: ").lower()
@@ -181,11 +861,19 @@ def main():
         save_script_config(config)
         console.print("[green]Configuration saved![/green]\n")
 
-    # Prepare for fetching
-    results = {}
-    results["OLLAMA_BASE"] = config["OLLAMA_URL"].replace("/models", "")
-    results["LMSTUDIO_BASE"] = config["LMSTUDIO_URL"].replace("/models", "")
-    results["LLAMA_BASE"] = config["LLAMA_URL"].replace("/models", "")
+    endpoints = endpoints_from_config(config)
+    backups = open_backup_store(config)
+    cache = CatalogCache().load()
+    cached = cache.results(endpoints)
+    if enrichment_enabled(config):
+        DetailCache().load().fill(endpoints, cached)
+
+    # Serve the last known catalogs right away; the fetch below revalidates them
+    if targets is None and os.path.exists(OPENCODE_CONFIG_FILE) and any(cached.get(ep.key) is not None
+                                                                       for ep in endpoints):
+        update_opencode_config(cached, backups)
+
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 
     with Progress(
         SpinnerColumn(),
@@ -194,73 +882,44 @@ def main():
         TaskProgressColumn(),
         console=console
     ) as progress:
-        
-        task_ollama = progress.add_task("[cyan]Checking Ollama...", total=1)
-        task_lmstudio = progress.add_task("[magenta]Checking LM Studio...", total=1)
-        task_llama = progress.add_task("[yellow]Checking Llama.cpp...", total=1)
-
-        # Threads for parallel fetching
-        def check_ollama():
-            models = fetch_models(config["OLLAMA_URL"], "Ollama")
-            results["OLLAMA"] = models
-            progress.update(task_ollama, advance=1, description=f"[cyan]Ollama: {'[green]Found ' + str(len(models)) if models else '[red]Failed'}")
-
-        def check_lmstudio():
-            models = fetch_models(config["LMSTUDIO_URL"], "LM Studio")
-            results["LMSTUDIO"] = models
-            progress.update(task_lmstudio, advance=1, description=f"[magenta]LM Studio: {'[green]Found ' + str(len(models)) if models else '[red]Failed'}")
-
-        def check_llama():
-            models = fetch_models(config["LLAMA_URL"], "Llama.cpp")
-            results["LLAMA"] = models
-            progress.update(task_llama, advance=1, description=f"[yellow]Llama.cpp: {'[green]Found ' + str(len(models)) if models else '[red]Failed'}")
-
-        t1 = threading.Thread(target=check_ollama)
-        t2 = threading.Thread(target=check_lmstudio)
-        t3 = threading.Thread(target=check_llama)
-
-        t1.start()
-        t2.start()
-        t3.start()
-
-        t1.join()
-        t2.join()
-        t3.join()
 
-    console.print("\n[bold]Updating OpenCode Configuration...[/bold]")
-    updated_providers, removed_count = update_opencode_config(results)
+        tasks = {}
+        for ep in endpoints:
+            style = ep.adapter.style
+            known = f" [dim](cached: {len(cached[ep.key])})[/dim]" if cached.get(ep.key) is not None else ""
+            tasks[ep.key] = progress.add_task(f"[{style}]Checking {ep.label}...{known}", total=1)
 
-    # Summary Table
-    table = Table(title="Update Summary")
-    table.add_column("Provider", style="cyan")
-    table.add_column("Status", style="green")
-    table.add_column("Models Found", justify="right")
+        timings = {}
 
-    if results.get("OLLAMA"):
-        table.add_row("Ollama", "[green]Updated[/green]", str(len(results["OLLAMA"])))
-    else:
-        table.add_row("Ollama", "[red]Failed/Skipped[/red]", "0")
+        def on_result(ep, models, elapsed, error):
+            if elapsed is not None:
+                timings[ep.key] = elapsed
+            style = ep.adapter.style
+            status = '[green]Found ' + str(len(models)) if models else failure_status(error)
+            progress.update(tasks[ep.key], advance=1, description=f"[{style}]{ep.label}: {status}")
 
-    if results.get("LMSTUDIO"):
-        table.add_row("LM Studio", "[green]Updated[/green]", str(len(results["LMSTUDIO"])))
-    else:
-        table.add_row("LM Studio", "[red]Failed/Skipped[/red]", "0")
+        # All endpoints are polled concurrently; results stream in as they arrive
+        results = fetch_results(endpoints, cache, on_result, max_response_size(config))
 
-    if results.get("LLAMA"):
-        table.add_row("Llama.cpp", "[green]Updated[/green]", str(len(results["LLAMA"])))
-    else:
-        table.add_row("Llama.cpp", "[red]Failed/Skipped[/red]", "0")
+    with console.status("Inspecting new models..."):
+        detail_requests = enrich_results(config, endpoints, results)
+    if detail_requests:
+        console.print(f"[dim]Fetched details for {detail_requests} model(s).[/dim]")
 
-    console.print(table)
-    
-    if removed_count > 0:
-        console.print(f"\n[yellow]Removed {removed_count} models that are no longer available.[/yellow]")
-    
-    if not updated_providers:
-        console.print("\n[red]No providers were updated. Please check your connections.[/red]")
-    else:
-        console.print("\n[bold green]Success! OpenCode configuration has been updated.[/bold green]")
-        console.print("Restart OpenCode and run [bold]/models[/bold] to see your new models.")
+    console.print("\n[bold]Updating OpenCode Configuration...[/bold]")
+    updated_providers, diffs, written, outcomes = sync_results(results, config, targets, backups)
+    warmed = None
+    if warming_enabled(args, config):
+        models = added_models(endpoints, results, diffs)
+        if models:
+            with console.status(f"Warming up {len(models)} new model(s)..."):
+                warmed = warm_models(config, models)
+    if outcomes is not None:
+        print_targets(outcomes)
+    print_summary(endpoints, results, timings, updated_providers, total_changes(diffs)["removed"], written,
+                  history=outcomes is None, profiles=open_profiles())
+    if warmed:
+        print_warmup(warmed)
 
 if __name__ == "__main__":
     try:
@@ -268,3 +927,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         console.print("\n[red]Cancelled by user.[/red]")
         sys.exit(0)
+    except BrokenPipeError:
+        # Output piped into e.g. `head`; silence the flush at interpreter exit
+        sys.stdout = open(os.devnull, 'w')
+        sys.exit(0)
@@ -0,0 +1,6 @@
+"""Shared sync engine for the OmniLink model updaters (V5 TUI and Windows GUI)."""
+import os
+
+# Persistent state (backups, endpoint health) and disposable caches
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".local", "state", "omnilink")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "omnilink")
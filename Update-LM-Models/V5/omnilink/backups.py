@@ -0,0 +1,139 @@
+"""Content-addressed, compressed backup store for opencode.json.
+
+Every distinct config version is stored once as ``blobs/<sha256>.json.gz``.
+``index.jsonl`` is an append-only log with one line per write (sync or
+rollback) recording the content hash before and after plus the change
+counts. Retention compacts the log and drops unreferenced blobs, so the
+store size and the cost of listing or restoring stay bounded no matter
+how many runs have happened.
+"""
+import json
+import os
+import time
+
+from . import STATE_DIR
+from .persist import atomic_write
+
+DEFAULT_BACKUP_DIR = os.path.join(STATE_DIR, "backups")
+DEFAULT_KEEP = 50          # history entries kept
+DEFAULT_MAX_AGE_DAYS = 0   # 0 keeps entries regardless of age
+
+
+class BackupStore:
+    """Deduplicated opencode.json history with a retention policy."""
+
+    def __init__(self, root=DEFAULT_BACKUP_DIR, keep=DEFAULT_KEEP, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.root = root
+        self.keep = max(1, int(keep))
+        self.max_age_days = float(max_age_days)
+        self.index_file = os.path.join(root, "index.jsonl")
+        self.blob_dir = os.path.join(root, "blobs")
+
+    def _blob_path(self, sha):
+        return os.path.join(self.blob_dir, f"{sha}.json.gz")
+
+    def put(self, data):
+        """Stores ``data`` once and returns its content hash."""
+        import gzip
+        import hashlib
+
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(self.blob_dir, exist_ok=True)
+            atomic_write(path, gzip.compress(data, mtime=0))
+        return sha
+
+    def get(self, sha):
+        import gzip
+
+        with open(self._blob_path(sha), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def _load_index(self):
+        entries = []
+        try:
+            with open(self.index_file, 'r') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # Torn last line from an interrupted append
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def history(self):
+        """Returns the recorded writes, newest first, within the retention limit."""
+        return list(reversed(self._load_index()))[:self.keep]
+
+    def record(self, before, after, action="sync", changes=None):
+        """Records a write that replaced ``before`` bytes with ``after`` bytes."""
+        entry = {
+            "ts": time.time(),
+            "action": action,
+            "prev": self.put(before),
+            "sha": self.put(after),
+            "size": len(after),
+        }
+        if changes:
+            entry["changes"] = changes
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.prune()
+        return entry
+
+    def prune(self):
+        """Applies the retention policy once the index has grown past it."""
+        entries = self._load_index()
+        kept = entries[-self.keep:]
+        if self.max_age_days > 0:
+            cutoff = time.time() - self.max_age_days * 86400
+            # Always keep the newest entry so the last sync can be undone
+            kept = [e for e in kept[:-1] if e.get("ts", 0) >= cutoff] + kept[-1:]
+        # Compact with some slack so most runs stay a plain append
+        slack = max(10, self.keep // 4)
+        if len(entries) - len(kept) < slack:
+            return
+        atomic_write(self.index_file, "".join(json.dumps(e) + "\n" for e in kept).encode())
+
+        referenced = set()
+        for e in kept:
+            referenced.add(e.get("prev"))
+            referenced.add(e.get("sha"))
+        try:
+            names = os.listdir(self.blob_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".json.gz") and name[:-len(".json.gz")] not in referenced:
+                try:
+                    os.unlink(os.path.join(self.blob_dir, name))
+                except OSError:
+                    pass
+
+    def rollback(self, path, n=1):
+        """Restores ``path`` to how it was before the ``n``-th most recent write.
+
+        The rollback is itself recorded, so it can be undone with ``rollback 1``.
+        Returns the history entry that was undone and whether the file changed.
+        Raises IndexError when there is no such entry.
+        """
+        entries = self.history()
+        if not 1 <= n <= len(entries):
+            raise IndexError(f"No backup #{n} (history has {len(entries)} entries)")
+        entry = entries[n - 1]
+        target = self.get(entry["prev"])
+        try:
+            with open(path, 'rb') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = b""
+        if current == target:
+            return entry, False
+        self.record(current, target, action="rollback")
+        atomic_write(path, target)
+        return entry, True
@@ -0,0 +1,186 @@
+"""On-disk caches: last-known-good catalogs, per-model details and config layouts."""
+import os
+import time
+
+from . import CACHE_DIR
+from .persist import JSONStore
+
+DEFAULT_CACHE_FILE = os.path.join(CACHE_DIR, "catalogs.json")
+DEFAULT_DETAILS_FILE = os.path.join(CACHE_DIR, "details.json")
+DEFAULT_LAYOUTS_FILE = os.path.join(CACHE_DIR, "layouts.json")
+DETAIL_MAX_AGE = 30 * 86400   # seconds before details of a model no longer seen are dropped
+SEEN_RESOLUTION = 86400       # "seen" times are only refreshed (and saved) this often
+
+
+def _fill_from_entry(results, ep, entry):
+    results[ep.key] = list(entry["models"])
+    results[f"{ep.key}_STALE"] = entry.get("fetched_at", 0)
+    if isinstance(entry.get("digests"), dict):
+        results[f"{ep.key}_DIGESTS"] = dict(entry["digests"])
+
+
+class CatalogCache(JSONStore):
+    """Each endpoint's last successful model list, keyed by URL.
+
+    ``entries[url]`` holds ``models``, ``fetched_at``, the HTTP validators
+    and, for backends that report them, per-model ``digests``. The dict is
+    handed to fetch_all as its ``validators`` so fetches keep it current
+    and revalidate with conditional requests.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        super().__init__(path)
+
+    def results(self, endpoints):
+        """Builds a fetch_all-style results dict purely from the cache.
+
+        Cached endpoints get ``results[f"{key}_STALE"]`` with their fetch
+        time; endpoints never fetched successfully are None.
+        """
+        results = {}
+        for ep in endpoints:
+            results[f"{ep.key}_BASE"] = ep.base
+            entry = self.entries.get(ep.url)
+            if entry and isinstance(entry.get("models"), list):
+                _fill_from_entry(results, ep, entry)
+            else:
+                results[ep.key] = None
+        return results
+
+    def fill_stale(self, results, endpoints):
+        """Replaces failed endpoints in ``results`` with their last known models."""
+        for ep in endpoints:
+            if results.get(ep.key) is None:
+                entry = self.entries.get(ep.url)
+                if entry and isinstance(entry.get("models"), list):
+                    _fill_from_entry(results, ep, entry)
+        return results
+
+
+def detail_key(ep, model_id, digests=None):
+    """Details cache key: the model's content digest when known, else its host and id.
+
+    A digest identifies the exact weights, so a model served by several
+    hosts is inspected once, and a re-pulled model is inspected again.
+    """
+    digest = (digests or {}).get(model_id)
+    if digest:
+        return f"{ep.provider}@{digest}"
+    return f"{ep.url}#{model_id}"
+
+
+class DetailCache(JSONStore):
+    """OpenCode model fields learned from backend detail endpoints.
+
+    ``entries[key]`` (see detail_key) holds the ``fields`` to merge into the
+    model's opencode.json entry and when the model was last ``seen``. An
+    empty ``fields`` dict records a backend without a detail endpoint, so
+    it isn't asked again either.
+    """
+
+    def __init__(self, path=DEFAULT_DETAILS_FILE):
+        super().__init__(path)
+        self.dirty = False
+
+    def save(self):
+        """Writes the cache back, if anything changed, dropping long-unseen models."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        cutoff = time.time() - DETAIL_MAX_AGE
+        self.entries = {key: entry for key, entry in self.entries.items() if entry.get("seen", 0) >= cutoff}
+        super().save()
+
+    def put(self, key, fields):
+        self.entries[key] = {"fields": fields, "seen": time.time()}
+        self.dirty = True
+
+    def fill(self, endpoints, results):
+        """Sets ``results[f"{key}_DETAILS"]`` (``{model id: fields}``) from the cache.
+
+        Returns the models still to be inspected as ``{cache key: [(endpoint,
+        model id), ...]}``: those of freshly fetched endpoints (not cached
+        catalogs) whose backend has a detail endpoint.
+        """
+        now = time.time()
+        misses = {}
+        for ep in endpoints:
+            models = results.get(ep.key)
+            if not models:
+                continue
+            digests = results.get(f"{ep.key}_DIGESTS")
+            root = ep.adapter.server_root(ep.url)
+            askable = root is not None and f"{ep.key}_STALE" not in results
+            details = results[f"{ep.key}_DETAILS"] = {}
+            for model_id in models:
+                key = detail_key(ep, model_id, digests)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    if now - entry.get("seen", 0) > SEEN_RESOLUTION:
+                        entry["seen"] = now
+                        self.dirty = True
+                    if entry["fields"]:
+                        details[model_id] = entry["fields"]
+                elif askable and ep.adapter.detail_request(root, model_id) is not None:
+                    misses.setdefault(key, []).append((ep, model_id))
+        return misses
+
+
+def describe_age(fetched_at, now=None):
+    """Short human-readable age such as ``42s``, ``5m`` or ``3h``."""
+    age = max(0, (time.time() if now is None else now) - fetched_at)
+    if age < 60:
+        return f"{age:.0f}s"
+    if age < 3600:
+        return f"{age / 60:.0f}m"
+    if age < 86400:
+        return f"{age / 3600:.0f}h"
+    return f"{age / 86400:.0f}d"
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+class LayoutCache(JSONStore):
+    """Where the ``provider`` section of each opencode.json starts (see ConfigDocument.layout).
+
+    Keyed by real path and only trusted while the file's inode, size and
+    mtime are unchanged, so an unchanged config is never rescanned from
+    the top and a file edited by anyone else is.
+    """
+
+    def __init__(self, path=DEFAULT_LAYOUTS_FILE):
+        super().__init__(path)
+        self.dirty = False
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        super().save()
+
+    def get(self, path):
+        """The layout recorded for ``path`` if the file hasn't changed since, else None."""
+        entry = self.entries.get(os.path.realpath(path))
+        try:
+            if entry is None or entry.get("file") != _file_signature(path):
+                return None
+        except OSError:
+            return None
+        return entry.get("layout")
+
+    def put(self, path, layout):
+        """Records the layout of ``path`` as the file is now; None forgets it."""
+        path = os.path.realpath(path)
+        try:
+            entry = {"file": _file_signature(path), "layout": layout} if layout else None
+        except OSError:
+            entry = None
+        if self.entries.get(path) != entry:
+            if entry is None:
+                self.entries.pop(path, None)
+            else:
+                self.entries[path] = entry
+            self.dirty = True
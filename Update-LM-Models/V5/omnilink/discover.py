@@ -0,0 +1,174 @@
+"""LAN auto-discovery: asyncio connect scan plus /v1/models fingerprinting."""
+import asyncio
+import ipaddress
+import json
+from urllib.parse import urlsplit
+
+from . import httpclient
+from .endpoints import PROVIDERS, URL_KEY_RE
+
+DEFAULT_PORTS = tuple(dict.fromkeys(adapter.default_port for adapter in PROVIDERS.values()))
+DEFAULT_CONNECT_TIMEOUT = 0.5    # seconds per TCP connect attempt
+DEFAULT_PROBE_TIMEOUT = 3        # seconds per fingerprint request
+DEFAULT_CONCURRENCY = 256        # connects in flight at once
+MAX_HOSTS = 65536                # refuse to scan anything larger than a /16
+FINGERPRINT_MAX_SIZE = 8 * 1024 * 1024
+
+# The first adapter registered for a port wins the guess
+PORT_PROVIDERS = {adapter.default_port: key for key, adapter in reversed(PROVIDERS.items())}
+
+# Native endpoints that only one backend answers, tried when /v1/models
+# alone doesn't tell (e.g. a backend with no models loaded)
+NATIVE_PROBES = tuple((adapter.native_probe[0], key, adapter.native_probe[1])
+                      for key, adapter in PROVIDERS.items() if adapter.native_probe)
+
+
+def expand_targets(cidrs):
+    """Returns every host address in the given CIDRs (single addresses work too)."""
+    hosts = []
+    for cidr in cidrs:
+        network = ipaddress.ip_network(cidr, strict=False)
+        if len(hosts) + network.num_addresses > MAX_HOSTS:
+            raise ValueError(f"Refusing to scan more than {MAX_HOSTS} addresses")
+        hosts.extend(str(host) for host in (list(network.hosts()) or [network.network_address]))
+    return hosts
+
+
+def models_url(host, port):
+    if ":" in host:
+        host = f"[{host}]"
+    return f"http://{host}:{port}/v1/models"
+
+
+def classify_catalog(data):
+    """Guesses the backend from a /v1/models document; returns a provider or None.
+
+    An ``owned_by`` value claimed by an adapter decides first; otherwise the
+    adapters' looser ``looks_like`` heuristics are tried in registry order.
+    """
+    entries = [entry for entry in data["data"] if isinstance(entry, dict)]
+    owners = {entry.get("owned_by") for entry in entries}
+    for key, adapter in PROVIDERS.items():
+        if owners.intersection(adapter.owners):
+            return key
+    for key, adapter in PROVIDERS.items():
+        if adapter.looks_like(data, entries):
+            return key
+    return None
+
+
+async def _get_json(client, url, timeout):
+    response = await client.get(url, timeout=timeout, max_size=FINGERPRINT_MAX_SIZE)
+    if response.status != 200:
+        return None
+    data = json.loads(response.body.decode())
+    return data if isinstance(data, dict) else None
+
+
+async def fingerprint(host, port, client, timeout=DEFAULT_PROBE_TIMEOUT):
+    """Identifies the backend behind an open port.
+
+    Returns ``{"provider", "url", "models", "how"}`` where ``how`` is
+    ``catalog`` (told apart by the /v1/models document), ``native`` (by a
+    backend-specific endpoint) or ``port`` (only the default port matched),
+    with ``provider`` None for OpenAI-compatible servers we can't place.
+    Returns None when the port doesn't serve /v1/models at all.
+    """
+    url = models_url(host, port)
+    try:
+        data = await _get_json(client, url, timeout)
+    except Exception:
+        return None
+    if data is None or not isinstance(data.get("data"), list):
+        return None
+    found = {"provider": classify_catalog(data), "url": url, "models": len(data["data"]), "how": "catalog"}
+    if found["provider"] is None:
+        base = url[:-len("/v1/models")]
+        for path, provider, marker in NATIVE_PROBES:
+            try:
+                native = await _get_json(client, base + path, timeout)
+            except Exception:
+                continue
+            if native is not None and marker in native:
+                found.update(provider=provider, how="native")
+                break
+        else:
+            found.update(provider=PORT_PROVIDERS.get(port), how="port")
+    return found
+
+
+async def discover_async(cidrs, ports=DEFAULT_PORTS, timeout=DEFAULT_CONNECT_TIMEOUT,
+                         concurrency=DEFAULT_CONCURRENCY, probe_timeout=DEFAULT_PROBE_TIMEOUT, on_found=None):
+    """Scans every host/port pair and fingerprints the open ones.
+
+    A pool of ``concurrency`` workers connects with a short ``timeout``;
+    each open port is fingerprinted right away by the worker that found it,
+    so the scan and the HTTP probes overlap. ``on_found(found)`` is called
+    per identified endpoint. Returns the found endpoints in address order.
+    """
+    hosts = expand_targets(cidrs)
+    targets = ((host, port) for host in hosts for port in ports)
+    client = httpclient.HTTPClient()
+    results = []
+
+    async def worker():
+        for host, port in targets:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            except (OSError, asyncio.TimeoutError):
+                continue
+            writer.close()
+            found = await fingerprint(host, port, client, probe_timeout)
+            if found is not None:
+                results.append((ipaddress.ip_address(host), port, found))
+                if on_found:
+                    on_found(found)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(hosts) * len(ports)))))
+    finally:
+        await client.close()
+    results.sort(key=lambda item: (item[0].version, item[0], item[1]))
+    return [found for _, _, found in results]
+
+
+def discover(cidrs, **kwargs):
+    """Synchronous entry point for discover_async."""
+    return asyncio.run(discover_async(cidrs, **kwargs))
+
+
+def _address(url):
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return ("127.0.0.1" if host == "localhost" else host), parts.port
+
+
+def add_to_config(config, found, replace=False):
+    """Assigns ``<PROVIDER>_URL`` / ``<PROVIDER>_URL_<n>`` keys to discovered endpoints.
+
+    Endpoints whose host and port are already configured are skipped. With
+    ``replace``, every existing URL is dropped first (the base keys are set
+    to empty so the defaults don't come back). Returns the ``(key, url)``
+    pairs that were added.
+    """
+    if replace:
+        for key in [key for key in config if URL_KEY_RE.match(key)]:
+            if URL_KEY_RE.match(key).group(2):
+                del config[key]
+            else:
+                config[key] = ""
+    known = {_address(value) for key, value in config.items() if URL_KEY_RE.match(key) and value}
+    added = []
+    for entry in found:
+        provider = entry["provider"]
+        if provider is None or _address(entry["url"]) in known:
+            continue
+        key = f"{provider}_URL"
+        index = 1
+        while config.get(key):
+            index += 1
+            key = f"{provider}_URL_{index}"
+        config[key] = entry["url"]
+        known.add(_address(entry["url"]))
+        added.append((key, entry["url"]))
+    return added
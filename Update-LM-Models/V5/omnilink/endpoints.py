@@ -0,0 +1,90 @@
+"""Backend endpoint definitions shared by the TUI and the Windows GUI."""
+import re
+
+from .providers import PROVIDERS
+
+# Matches OLLAMA_URL, OLLAMA_URL_2, LMSTUDIO_URL_13, ...; the prefix must
+# also be a registered provider
+URL_KEY_RE = re.compile(r'^([A-Z][A-Z0-9]*)_URL(?:_(\d+))?$')
+
+
+class Endpoint:
+    """One backend to poll: a provider and the /v1/models URL it answers on.
+
+    The first endpoint of each provider keeps the historical results key
+    (``OLLAMA``) and opencode provider key (``ollama``); additional hosts
+    configured as ``OLLAMA_URL_2`` etc. become ``OLLAMA_2`` / ``ollama-2``.
+    """
+
+    def __init__(self, provider, url, index=1):
+        self.provider = provider
+        self.url = url
+        self.index = index
+        self.key = provider if index == 1 else f"{provider}_{index}"
+
+    @property
+    def base(self):
+        return self.url.replace("/models", "")
+
+    @property
+    def adapter(self):
+        return PROVIDERS[self.provider]
+
+    @property
+    def label(self):
+        label = self.adapter.label
+        return label if self.index == 1 else f"{label} {self.index}"
+
+    @property
+    def provider_key(self):
+        return provider_info(self.key)[0]
+
+    @property
+    def provider_name(self):
+        return provider_info(self.key)[1]
+
+    def __repr__(self):
+        return f"Endpoint({self.key!r}, {self.url!r})"
+
+
+def split_key(key):
+    """Splits a results key such as ``OLLAMA_2`` into ``("OLLAMA", 2)``."""
+    provider, _, index = key.partition('_')
+    if provider not in PROVIDERS:
+        return None, None
+    if not index:
+        return provider, 1
+    if not index.isdigit():
+        return None, None
+    return provider, int(index)
+
+
+def provider_info(key):
+    """Returns the (opencode provider key, provider name) for a results key."""
+    provider, index = split_key(key)
+    if provider is None:
+        return None
+    adapter = PROVIDERS[provider]
+    provider_key, provider_name = adapter.provider_key, adapter.name
+    if index == 1:
+        return provider_key, provider_name
+    return f"{provider_key}-{index}", provider_name.replace(")", f" {index})")
+
+
+def endpoints_from_config(config):
+    """Builds the list of endpoints from a script config dict.
+
+    Every non-empty ``<PROVIDER>_URL`` / ``<PROVIDER>_URL_<n>`` entry of a
+    registered provider becomes one endpoint, ordered by provider and then
+    by index.
+    """
+    order = list(PROVIDERS)
+    endpoints = []
+    for key, value in config.items():
+        match = URL_KEY_RE.match(key)
+        if not match or not value or match.group(1) not in PROVIDERS:
+            continue
+        index = int(match.group(2)) if match.group(2) else 1
+        endpoints.append(Endpoint(match.group(1), value, index))
+    endpoints.sort(key=lambda ep: (order.index(ep.provider), ep.index))
+    return endpoints
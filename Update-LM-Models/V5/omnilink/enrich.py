@@ -0,0 +1,93 @@
+"""Parallel model metadata enrichment: context length, tool support, modalities.
+
+Each backend adapter may name a per-model detail endpoint (Ollama's
+``/api/show``, LM Studio's ``/api/v0/models/<id>``, llama.cpp's
+``/props``). Models missing from the DetailCache are inspected
+concurrently, bounded overall and per host so a single backend isn't
+flooded; everything else comes from the cache, so syncing an unchanged
+fleet makes no detail requests at all.
+"""
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from . import httpclient, metrics
+
+DEFAULT_CONCURRENCY = 16     # detail requests in flight at once
+PER_HOST_CONCURRENCY = 4     # ... and against any one host
+DEFAULT_TIMEOUT = 10         # seconds per detail request
+DETAIL_MAX_SIZE = 8 * 1024 * 1024
+
+
+async def _inspect(ep, request, client, timeout):
+    """Fetches and parses one detail request; returns the fields or None to retry later."""
+    method, url, body = request
+    metrics.count("detail_requests", provider=ep.provider_key)
+    try:
+        if method == "POST":
+            response = await client.post_json(url, body, timeout=timeout, max_size=DETAIL_MAX_SIZE)
+        else:
+            response = await client.get(url, timeout=timeout, max_size=DETAIL_MAX_SIZE)
+    except Exception:
+        return None
+    if response.status == 404:
+        return {}
+    if response.status != 200:
+        return None
+    try:
+        doc = json.loads(response.body.decode("utf-8"))
+        return ep.adapter.parse_details(doc) if isinstance(doc, dict) else {}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+async def enrich_async(endpoints, results, cache, client=None, concurrency=DEFAULT_CONCURRENCY,
+                       per_host=PER_HOST_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+    """Adds ``results[f"{key}_DETAILS"]`` (``{model id: fields}``) for every endpoint.
+
+    Cached details are used as they are; the rest are requested from the
+    backends and stored in ``cache`` (a DetailCache). Models sharing a
+    digest, or a backend-wide detail endpoint such as llama.cpp's
+    ``/props``, are requested once. Requests that fail are left out and
+    tried again on the next run. Returns the number of detail requests made.
+    """
+    with metrics.span("enrich"):
+        misses = cache.fill(endpoints, results)
+        if not misses:
+            return 0
+        requests = {}
+        for key, waiting in misses.items():
+            ep, model_id = waiting[0]
+            method, url, body = ep.adapter.detail_request(ep.adapter.server_root(ep.url), model_id)
+            signature = (method, url, json.dumps(body, sort_keys=True))
+            requests.setdefault(signature, (ep, (method, url, body), []))[2].append((key, waiting))
+
+        owns_client = client is None
+        if owns_client:
+            client = httpclient.HTTPClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        hosts = {}
+
+        async def run(ep, request, keys):
+            host = hosts.setdefault(urlsplit(ep.url).netloc, asyncio.Semaphore(per_host))
+            async with semaphore, host:
+                fields = await _inspect(ep, request, client, timeout)
+            if fields is None:
+                return
+            for key, waiting in keys:
+                cache.put(key, fields)
+                for owner, model_id in waiting:
+                    if fields:
+                        results[f"{owner.key}_DETAILS"][model_id] = fields
+
+        try:
+            await asyncio.gather(*(run(*request) for request in requests.values()))
+        finally:
+            if owns_client:
+                await client.close()
+        return len(requests)
+
+
+def enrich(endpoints, results, cache, **kwargs):
+    """Synchronous entry point for enrich_async."""
+    return asyncio.run(enrich_async(endpoints, results, cache, **kwargs))
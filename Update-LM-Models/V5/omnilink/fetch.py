@@ -0,0 +1,245 @@
+"""Concurrent asyncio fetch engine for an arbitrary fleet of backends."""
+import asyncio
+import socket
+import ssl
+import time
+
+from . import httpclient, metrics
+from .health import HALF_OPEN, OPEN, probe
+from .jsonstream import CatalogParser
+
+DEFAULT_TIMEOUT = 5        # seconds per endpoint
+DEFAULT_DEADLINE = 15      # seconds for the whole run
+DEFAULT_CONCURRENCY = 128  # endpoints polled at once; above typical fleet sizes, so a run is only
+                           # as slow as its slowest endpoint, and well below default fd limits
+DEFAULT_MAX_RESPONSE = 64 * 1024 * 1024   # bytes per catalog, after decompression
+
+
+class FetchError(Exception):
+    """A failed catalog fetch, tagged with an error class for health tracking."""
+
+    def __init__(self, kind, message=None):
+        super().__init__(message or kind)
+        self.kind = kind
+
+
+def classify_error(exc):
+    """Maps an exception to a short error class: refused, timeout, dns, ..."""
+    if isinstance(exc, FetchError):
+        return exc.kind
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, ConnectionRefusedError):
+        return "refused"
+    if isinstance(exc, socket.gaierror):
+        return "dns"
+    if isinstance(exc, httpclient.ResponseTooLarge):
+        return "too-large"
+    if isinstance(exc, ssl.SSLError):
+        return "tls"
+    if isinstance(exc, (ConnectionResetError, asyncio.IncompleteReadError, httpclient.HTTPError)):
+        return "protocol"
+    if isinstance(exc, OSError):
+        return "unreachable"
+    if isinstance(exc, (ValueError, KeyError, TypeError)):
+        return "invalid"
+    return "error"
+
+
+async def _read_catalog(url, client, parser, timeout, headers, max_size):
+    """GETs one catalog URL, streaming 200 bodies into ``parser``; returns ``(response, entries)``."""
+    entries = []
+
+    def consume(chunk):
+        with metrics.span("decode", bytes=len(chunk)):
+            entries.extend(parser.feed(chunk))
+
+    response = await client.get(url, headers=headers, timeout=timeout, consumer=consume, max_size=max_size)
+    if response.status == 200:
+        entries.extend(parser.close())
+    return response, entries
+
+
+async def fetch_catalog(url, client, timeout=DEFAULT_TIMEOUT, validators=None, max_size=DEFAULT_MAX_RESPONSE,
+                        adapter=None):
+    """Fetches the models advertised by one endpoint; returns ``(model ids, digests)``.
+
+    ``url`` is the configured /v1/models URL. With a Provider ``adapter``
+    that has a native catalog (e.g. Ollama's ``/api/tags``), that is read
+    instead, and ``digests`` maps each model id to its content digest when
+    the backend reports one (otherwise it is None). A native catalog that
+    answers 404, e.g. an OpenAI-compatible proxy configured as Ollama,
+    falls back to /v1/models and is not tried again for that URL.
+
+    The response is parsed incrementally as it arrives, keeping only the
+    ids (and digests), so memory doesn't grow with metadata-heavy catalogs;
+    responses over ``max_size`` bytes fail with ``too-large``.
+
+    When ``validators`` is a dict (usually CatalogCache.entries), the last
+    model list, digests, fetch time and ``ETag``/``Last-Modified`` are kept
+    in ``validators[url]``; the validators are sent back as a conditional
+    request and a 304 reuses the stored list without parsing.
+    Raises FetchError on any failure.
+    """
+    known = validators.get(url) if validators is not None else None
+    native = adapter is not None and adapter.catalog_url(url) != url and not (known and known.get("native") is False)
+    source = adapter.catalog_url(url) if native else url
+    headers = {}
+    # Validators only apply to the URL they were issued for
+    if known and known.get("source", url) == source:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+
+    try:
+        parser = adapter.parser(native) if adapter is not None else CatalogParser()
+        response, entries = await _read_catalog(source, client, parser, timeout, headers, max_size)
+        if response.status == 404 and native:
+            native = False
+            source = url
+            response, entries = await _read_catalog(url, client, adapter.parser(False), timeout, {}, max_size)
+        if response.status == 304 and known:
+            known["fetched_at"] = time.time()
+            return list(known["models"]), known.get("digests")
+        if response.status != 200:
+            raise FetchError("http", f"HTTP {response.status}")
+    except Exception as e:
+        if isinstance(e, FetchError):
+            raise
+        raise FetchError(classify_error(e), str(e) or type(e).__name__) from e
+
+    if adapter is not None:
+        models, digests = adapter.split(entries, native)
+    else:
+        models, digests = entries, None
+    if validators is not None:
+        validators[url] = {
+            "models": models,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+        if source != url:
+            validators[url]["source"] = source
+        if digests is not None:
+            validators[url]["digests"] = digests
+        if adapter is not None and adapter.catalog_url(url) != url and not native:
+            validators[url]["native"] = False
+    return models, digests
+
+
+def record_fetch(ep, error=None):
+    """Counts one fetch attempt (and its failure class) for the metrics export."""
+    metrics.count("fetches", provider=ep.provider_key)
+    if error:
+        metrics.count("fetch_failures", provider=ep.provider_key, error=error)
+
+
+async def _fetch_endpoint(ep, client, timeout, validators, health, max_size):
+    """Fetches one endpoint through its circuit breaker; returns ``(models, digests, error)``."""
+    if health is None:
+        try:
+            return (*await fetch_catalog(ep.url, client, timeout, validators, max_size, ep.adapter), None)
+        except FetchError as e:
+            return None, None, e.kind
+
+    state = health.state(ep.url)
+    if state == OPEN:
+        return None, None, "circuit-open"
+    if state == HALF_OPEN:
+        try:
+            await probe(ep.url)
+        except Exception as e:
+            health.failure(ep.url, classify_error(e))
+            return None, None, classify_error(e)
+
+    start = time.monotonic()
+    try:
+        models, digests = await fetch_catalog(ep.url, client, health.timeout_for(ep.url, timeout), validators,
+                                              max_size, ep.adapter)
+    except FetchError as e:
+        health.failure(ep.url, e.kind)
+        return None, None, e.kind
+    health.success(ep.url, time.monotonic() - start)
+    return models, digests, None
+
+
+async def fetch_all_async(endpoints, on_result=None, concurrency=DEFAULT_CONCURRENCY,
+                          timeout=DEFAULT_TIMEOUT, deadline=DEFAULT_DEADLINE,
+                          client=None, validators=None, health=None, max_size=DEFAULT_MAX_RESPONSE):
+    """Polls every endpoint concurrently and returns the results dict.
+
+    The dict keeps the historical layout: ``results[ep.key]`` is the list of
+    model ids (or ``None`` on failure) and ``results[f"{ep.key}_BASE"]`` the
+    base URL; failed endpoints also get ``results[f"{ep.key}_ERROR"]`` with
+    their error class, and endpoints whose backend reports content digests
+    ``results[f"{ep.key}_DIGESTS"]`` (``{model id: digest}``).
+    ``on_result(endpoint, models, elapsed, error)`` is called as soon as
+    each endpoint finishes, so callers can stream progress. Endpoints
+    still running when ``deadline`` expires are cancelled and reported as
+    failed (``timeout``); endpoints that were still queued behind
+    ``concurrency`` and never contacted are reported as
+    ``deadline-skipped`` and leave their health untouched.
+
+    With a HealthStore as ``health``, each endpoint gets a timeout fitted to
+    its usual latency, and endpoints that keep failing are skipped
+    (``circuit-open``) until a cheap connect probe succeeds again.
+
+    Pass a long-lived ``client`` and ``validators`` dict to reuse pooled
+    connections and conditional-request state across runs on the same loop.
+    ``max_size`` caps each catalog response in bytes.
+    """
+    results = {}
+    for ep in endpoints:
+        results[f"{ep.key}_BASE"] = ep.base
+
+    owns_client = client is None
+    if owns_client:
+        client = httpclient.HTTPClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = set()
+
+    async def run(ep):
+        async with semaphore:
+            started.add(ep.key)
+            metrics.set_track(ep.key)
+            start = time.monotonic()
+            with metrics.span("fetch", endpoint=ep.key):
+                models, digests, error = await _fetch_endpoint(ep, client, timeout, validators, health, max_size)
+            elapsed = time.monotonic() - start
+        record_fetch(ep, error)
+        results[ep.key] = models
+        if digests is not None:
+            results[f"{ep.key}_DIGESTS"] = digests
+        if error:
+            results[f"{ep.key}_ERROR"] = error
+        if on_result:
+            on_result(ep, models, elapsed, error)
+
+    tasks = [asyncio.ensure_future(run(ep)) for ep in endpoints]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if owns_client:
+        await client.close()
+
+    for ep in endpoints:
+        if ep.key not in results:
+            # Only requests that actually went out count against an endpoint's health
+            error = "timeout" if ep.key in started else "deadline-skipped"
+            results[ep.key] = None
+            results[f"{ep.key}_ERROR"] = error
+            record_fetch(ep, error)
+            if health is not None and error == "timeout":
+                health.failure(ep.url, "timeout")
+            if on_result:
+                on_result(ep, None, deadline, error)
+    return results
+
+
+def fetch_all(endpoints, on_result=None, **kwargs):
+    """Synchronous entry point for fetch_all_async, usable from any thread."""
+    return asyncio.run(fetch_all_async(endpoints, on_result=on_result, **kwargs))
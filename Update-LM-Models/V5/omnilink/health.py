@@ -0,0 +1,79 @@
+"""Persisted per-endpoint health: latency EWMA, adaptive timeouts, circuit breaker."""
+import asyncio
+import os
+import time
+
+from . import STATE_DIR
+from .httpclient import parse_url
+from .persist import JSONStore
+
+DEFAULT_HEALTH_FILE = os.path.join(STATE_DIR, "health.json")
+EWMA_ALPHA = 0.3
+MIN_TIMEOUT = 1.0           # never time out a known-good host faster than this
+TIMEOUT_FACTOR = 4          # timeout = FACTOR x latency EWMA + MARGIN
+TIMEOUT_MARGIN = 0.5
+FAILURE_THRESHOLD = 3       # consecutive failures before the breaker opens
+BASE_COOLDOWN = 30          # seconds the breaker stays open at first
+MAX_COOLDOWN = 3600
+PROBE_TIMEOUT = 0.3         # TCP connect probe used when half-open
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class HealthStore(JSONStore):
+    """Health records keyed by endpoint URL, loaded from and saved to JSON.
+
+    Each record holds ``latency`` (EWMA of successful fetches, seconds),
+    ``failures`` (consecutive), ``last_error`` (error class such as
+    ``refused`` or ``timeout``), ``last_ok``/``last_failure`` timestamps and
+    ``open_until`` while the circuit breaker is open.
+    """
+
+    pretty = True
+
+    def __init__(self, path=DEFAULT_HEALTH_FILE):
+        super().__init__(path)
+
+    def record(self, url):
+        return self.entries.setdefault(url, {"latency": None, "failures": 0, "last_error": None})
+
+    def state(self, url, now=None):
+        """Returns CLOSED, OPEN (skip the endpoint) or HALF_OPEN (probe first)."""
+        rec = self.entries.get(url)
+        if not rec or rec.get("failures", 0) < FAILURE_THRESHOLD:
+            return CLOSED
+        now = time.time() if now is None else now
+        return OPEN if now < rec.get("open_until", 0) else HALF_OPEN
+
+    def timeout_for(self, url, default):
+        """Timeout scaled to the endpoint's usual latency, capped at ``default``."""
+        rec = self.entries.get(url)
+        if not rec or rec.get("latency") is None or rec.get("failures", 0):
+            return default
+        return min(default, max(MIN_TIMEOUT, rec["latency"] * TIMEOUT_FACTOR + TIMEOUT_MARGIN))
+
+    def success(self, url, elapsed):
+        rec = self.record(url)
+        latency = rec.get("latency")
+        rec["latency"] = elapsed if latency is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * latency
+        rec["failures"] = 0
+        rec["last_ok"] = time.time()
+        rec.pop("open_until", None)
+
+    def failure(self, url, kind):
+        rec = self.record(url)
+        rec["failures"] = rec.get("failures", 0) + 1
+        rec["last_error"] = kind
+        rec["last_failure"] = now = time.time()
+        if rec["failures"] >= FAILURE_THRESHOLD:
+            cooldown = BASE_COOLDOWN * 2 ** (rec["failures"] - FAILURE_THRESHOLD)
+            rec["open_until"] = now + min(cooldown, MAX_COOLDOWN)
+
+
+async def probe(url, timeout=PROBE_TIMEOUT):
+    """Cheap half-open check: can a TCP connection to the endpoint be opened?"""
+    _, host, port, _ = parse_url(url)
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    writer.close()
@@ -0,0 +1,297 @@
+"""Minimal asyncio HTTP/1.1 client used to poll backend model catalogs."""
+import asyncio
+import json
+import socket
+import ssl
+import zlib
+from urllib.parse import urlsplit
+
+from . import metrics
+
+USER_AGENT = "OmniLink-Model-Updater"
+CHUNK_SIZE = 64 * 1024
+
+
+class HTTPError(Exception):
+    """Raised when a backend answers with something that isn't valid HTTP."""
+
+
+class ResponseTooLarge(HTTPError):
+    """Raised when a response body grows past the caller's ``max_size``."""
+
+
+class Response:
+    """Status, lower-cased headers and decoded body of a finished request.
+
+    ``body`` is empty when the body was streamed to a consumer instead.
+    """
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def parse_url(url):
+    """Splits a URL into ``(scheme, host, port, path)``."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise HTTPError(f"Unsupported URL scheme: {url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return parts.scheme, parts.hostname, port, path
+
+
+async def _read_head(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise HTTPError("Connection closed before response")
+    try:
+        version, status, _ = (status_line.decode("latin-1").rstrip("\r\n") + " ").split(" ", 2)
+        status = int(status)
+    except ValueError:
+        raise HTTPError(f"Malformed status line: {status_line!r}")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return version, status, headers
+
+
+async def _iter_body(reader, status, headers):
+    """Yields the raw (still content-encoded) body in pieces of at most CHUNK_SIZE."""
+    if status in (204, 304) or 100 <= status < 200:
+        return
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";")[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(f"Malformed chunk size: {size_line!r}")
+            if size == 0:
+                # Skip optional trailers up to the terminating blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            while size:
+                data = await reader.readexactly(min(size, CHUNK_SIZE))
+                size -= len(data)
+                yield data
+            await reader.readline()
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining:
+            data = await reader.readexactly(min(remaining, CHUNK_SIZE))
+            remaining -= len(data)
+            yield data
+    else:
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def _host_header(scheme, host, port):
+    """The ``Host`` value: IPv6 literals in brackets, the port only when it isn't the scheme's default."""
+    if ":" in host:
+        host = f"[{host}]"
+    if port == (443 if scheme == "https" else 80):
+        return host
+    return f"{host}:{port}"
+
+
+def _is_ip_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+
+def _decompressor(headers):
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    return None
+
+
+def _inflate(decompressor, data):
+    # Bounded output per step, so a small compressed body can't balloon memory
+    while True:
+        out = decompressor.decompress(data, CHUNK_SIZE)
+        if out:
+            yield out
+        data = decompressor.unconsumed_tail
+        if not data and len(out) < CHUNK_SIZE:
+            return
+
+
+class HTTPClient:
+    """Keep-alive connection pool shared by every request of a sync run.
+
+    Idle connections are kept per (scheme, host, port) and reused, so polling
+    several endpoints on one host, or the same host repeatedly in watch mode,
+    pays TCP/TLS setup once. Responses are requested gzip-compressed. The
+    client is bound to the event loop it is used on; call ``close()`` when done.
+    """
+
+    def __init__(self, max_idle_per_host=4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._ssl_context = None
+
+    async def _connect(self, scheme, host, port):
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        # Resolve separately so DNS and connect time can be told apart
+        if _is_ip_address(host):
+            addresses = [host]
+        else:
+            with metrics.span("dns", host=host):
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addresses = [sockaddr[0] for *_, sockaddr in infos]
+        with metrics.span("connect", host=host):
+            error = None
+            for address in addresses:
+                try:
+                    return await asyncio.open_connection(address, port, ssl=ssl_context,
+                                                         server_hostname=host if ssl_context else None)
+                except OSError as e:
+                    error = e
+            raise error or OSError(f"No address found for {host}")
+
+    def _checkout(self, origin):
+        idle = self._idle.get(origin, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return None
+
+    def _checkin(self, origin, conn):
+        idle = self._idle.setdefault(origin, [])
+        if len(idle) < self.max_idle_per_host:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def _exchange(self, conn, scheme, host, port, method, path, headers, body, consumer, max_size, progress):
+        with metrics.span("download", host=host):
+            return await self._roundtrip(conn, scheme, host, port, method, path, headers, body, consumer, max_size,
+                                         progress)
+
+    async def _roundtrip(self, conn, scheme, host, port, method, path, headers, body, consumer, max_size, progress):
+        reader, writer = conn
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {_host_header(scheme, host, port)}",
+            f"User-Agent: {USER_AGENT}",
+            "Accept: application/json",
+            "Accept-Encoding: gzip, deflate",
+            "Connection: keep-alive",
+        ]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await writer.drain()
+        version, status, response_headers = await _read_head(reader)
+        progress["head"] = True
+
+        # Successful bodies go to the consumer as they arrive; anything else
+        # (error pages) is small and buffered
+        stream = consumer is not None and status == 200
+        decompressor = _decompressor(response_headers)
+        chunks = []
+        size = 0
+        async for raw in _iter_body(reader, status, response_headers):
+            for data in (_inflate(decompressor, raw) if decompressor else (raw,)):
+                size += len(data)
+                if max_size is not None and size > max_size:
+                    raise ResponseTooLarge(f"Response exceeds {max_size} bytes")
+                if stream:
+                    consumer(data)
+                else:
+                    chunks.append(data)
+        reusable = (
+            version == "HTTP/1.1"
+            and response_headers.get("connection", "").lower() != "close"
+            and ("content-length" in response_headers
+                 or response_headers.get("transfer-encoding", "").lower() == "chunked"
+                 or status in (204, 304))
+        )
+        return Response(status, response_headers, b"".join(chunks)), reusable
+
+    async def _request(self, method, url, headers, body, consumer, max_size):
+        scheme, host, port, path = parse_url(url)
+        origin = (scheme, host, port)
+        conn = self._checkout(origin)
+        if conn is not None:
+            # A pooled connection may have been dropped by the server while
+            # idle; retry once on a fresh connection, as long as no response
+            # (and no body data) had arrived yet. Every request we send is
+            # a read or side-effect free, so a resend is harmless.
+            progress = {}
+            try:
+                response, reusable = await self._exchange(conn, scheme, host, port, method, path, headers, body,
+                                                          consumer, max_size, progress)
+            except (OSError, HTTPError, asyncio.IncompleteReadError):
+                conn[1].close()
+                if progress:
+                    raise
+                conn = None
+            except BaseException:
+                conn[1].close()
+                raise
+        if conn is None:
+            conn = await self._connect(scheme, host, port)
+            try:
+                response, reusable = await self._exchange(conn, scheme, host, port, method, path, headers, body,
+                                                          consumer, max_size, {})
+            except BaseException:
+                conn[1].close()
+                raise
+        if reusable:
+            self._checkin(origin, conn)
+        else:
+            conn[1].close()
+        return response
+
+    async def get(self, url, headers=None, timeout=5, consumer=None, max_size=None):
+        """Performs a GET request, raising asyncio.TimeoutError after ``timeout`` seconds.
+
+        With a ``consumer``, the decoded body of a 200 response is passed to
+        ``consumer(chunk)`` piece by piece instead of being buffered. Bodies
+        larger than ``max_size`` bytes (after decompression) raise
+        ResponseTooLarge.
+        """
+        return await asyncio.wait_for(self._request("GET", url, headers, None, consumer, max_size), timeout)
+
+    async def post_json(self, url, data, headers=None, timeout=5, max_size=None, consumer=None):
+        """POSTs ``data`` as a JSON body; the response is handled like get()'s."""
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        body = json.dumps(data).encode("utf-8")
+        return await asyncio.wait_for(self._request("POST", url, headers, body, consumer, max_size), timeout)
+
+    async def close(self):
+        """Closes every idle pooled connection."""
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
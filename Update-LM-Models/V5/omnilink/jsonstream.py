@@ -0,0 +1,192 @@
+"""Incremental parser for model catalog responses.
+
+Catalogs from aggregating proxies can hold tens of thousands of entries with
+large metadata blobs. CatalogParser consumes the response in chunks and
+decodes one list entry at a time, so memory stays bounded by the largest
+single entry instead of the whole payload.
+"""
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+SEPARATOR = re.compile(r"[ \t\n\r]*,?[ \t\n\r]*")
+
+# Parser states
+_START, _KEY, _COLON, _VALUE, _ITEMS, _SKIP_ITEMS, _DONE = range(7)
+
+
+class CatalogParser:
+    """Streams ``{"<list_key>": [{"<id_key>": ...}, ...], ...}`` documents.
+
+    ``feed(data)`` accepts bytes (or str) and returns the entries completed
+    by that chunk; ``close()`` checks the document ended properly. With no
+    ``fields``, entries are plain model ids; otherwise they are dicts with
+    the id under ``"id"`` plus each requested top-level field that is
+    present. Other top-level values are skipped entry by entry when they
+    are lists, so e.g. llama.cpp's duplicate ``models`` list never gets
+    materialized either. Malformed input raises ValueError; only commas
+    between values are checked leniently (missing or repeated ones pass).
+    """
+
+    def __init__(self, fields=(), list_key="data", id_key="id"):
+        self.fields = tuple(fields)
+        self.list_key = list_key
+        self.id_key = id_key
+        self.count = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._state = _START
+        self._key = None
+        self._found = False
+        self._buf = ""
+        self._pending = []
+        self._pending_len = 0
+        self._min_len = 0
+
+    def feed(self, data):
+        if isinstance(data, bytes):
+            data = self._utf8.decode(data)
+        if not data:
+            return []
+        self._pending.append(data)
+        self._pending_len += len(data)
+        # While waiting for one large entry, only retry once the buffered
+        # text has doubled, so a huge entry is parsed O(n) times, not O(n²)
+        if len(self._buf) + self._pending_len < self._min_len:
+            return []
+        return self._parse(final=False)
+
+    def close(self):
+        """Parses whatever is left; raises ValueError if the document is incomplete."""
+        tail = self._utf8.decode(b"", final=True)
+        if tail:
+            self._pending.append(tail)
+        entries = self._parse(final=True)
+        if self._state != _DONE:
+            raise ValueError("Truncated catalog response")
+        if WHITESPACE.match(self._buf).end() != len(self._buf):
+            raise ValueError("Trailing data after catalog response")
+        if not self._found:
+            raise ValueError(f"Response has no '{self.list_key}' list")
+        return entries
+
+    def _value(self, buf, pos, final):
+        """Decodes one JSON value at ``pos``; returns ``(value, end)`` or None if incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # A number (or literal) is only complete once a delimiter follows it;
+        # "3." or "tr" at the end of a chunk continues in the next one
+        if not final and buf[end - 1] not in '}]"':
+            after = WHITESPACE.match(buf, end).end()
+            if after >= len(buf) or buf[after] not in ",]}":
+                return None
+        return value, end
+
+    def _entry(self, value):
+        if not isinstance(value, dict) or self.id_key not in value:
+            raise ValueError(f"Catalog entry without '{self.id_key}'")
+        self.count += 1
+        if not self.fields:
+            return value[self.id_key]
+        entry = {"id": value[self.id_key]}
+        for field in self.fields:
+            if field in value:
+                entry[field] = value[field]
+        return entry
+
+    def _parse(self, final):
+        if self._pending:
+            self._buf += "".join(self._pending)
+            self._pending = []
+            self._pending_len = 0
+        buf = self._buf
+        pos = 0
+        entries = []
+        while self._state != _DONE:
+            pos = WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+            state = self._state
+
+            if state == _START:
+                if char != "{":
+                    raise ValueError("Catalog response is not a JSON object")
+                self._state = _KEY
+                pos += 1
+            elif state == _KEY:
+                if char == "}":
+                    self._state = _DONE
+                    pos += 1
+                elif char == ",":
+                    pos += 1
+                elif char == '"':
+                    decoded = self._value(buf, pos, final)
+                    if decoded is None:
+                        break
+                    self._key, pos = decoded
+                    self._state = _COLON
+                else:
+                    raise ValueError(f"Unexpected {char!r} in catalog response")
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError(f"Expected ':' after {self._key!r}")
+                self._state = _VALUE
+                pos += 1
+            elif state == _VALUE:
+                if self._key == self.list_key:
+                    if char != "[":
+                        raise ValueError(f"'{self.list_key}' is not a list")
+                    self._found = True
+                    self._state = _ITEMS
+                    pos += 1
+                elif char == "[":
+                    self._state = _SKIP_ITEMS
+                    pos += 1
+                else:
+                    decoded = self._value(buf, pos, final)
+                    if decoded is None:
+                        break
+                    pos = decoded[1]
+                    self._state = _KEY
+            else:
+                # Inside the model list (_ITEMS) or a list being skipped; this
+                # is where nearly all the time goes, so entries are decoded in
+                # a tight loop
+                keep = state == _ITEMS
+                raw_decode = self._decoder.raw_decode
+                end = len(buf)
+                while True:
+                    pos = SEPARATOR.match(buf, pos).end()
+                    if pos >= end:
+                        break
+                    if buf[pos] == "]":
+                        self._state = _KEY
+                        pos += 1
+                        break
+                    if buf[pos] in "{[":
+                        try:
+                            value, pos_after = raw_decode(buf, pos)
+                        except json.JSONDecodeError:
+                            if final:
+                                raise
+                            break
+                    else:
+                        decoded = self._value(buf, pos, final)
+                        if decoded is None:
+                            break
+                        value, pos_after = decoded
+                    pos = pos_after
+                    if keep:
+                        entries.append(self._entry(value))
+                if self._state == state:
+                    break
+
+        self._buf = buf[pos:]
+        self._min_len = 2 * len(self._buf)
+        return entries
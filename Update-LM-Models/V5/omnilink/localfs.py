@@ -0,0 +1,271 @@
+"""Filesystem-event discovery of models held by local backends.
+
+Ollama keeps one manifest file per pulled model under
+``models/manifests/<registry>/<namespace>/<name>/<tag>``; the path alone
+gives the exact id ``/v1/models`` would report, so local Ollama catalogs
+are read straight from the directory tree. LM Studio and llama.cpp ids
+can't be derived reliably from ``.gguf`` paths, so those endpoints are
+still polled and changes under their model directories only trigger an
+early refresh.
+
+A guessed (not configured) Ollama directory is only read once its
+manifests match the catalog the server itself reports: a system-service
+install keeps its models elsewhere, and an empty or stale user directory
+must not empty the config.
+
+Directories are watched with inotify where available, falling back to
+periodic stat scans. Only names and stat results are ever looked at;
+model files are never opened.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+from urllib.parse import urlsplit
+
+OLLAMA_REGISTRY = "registry.ollama.ai"
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+DEFAULT_SCAN_INTERVAL = 2   # seconds between stat scans without inotify
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def default_models_dir(provider):
+    """Returns the standard model directory for a provider, or None."""
+    home = os.path.expanduser("~")
+    if provider == "OLLAMA":
+        candidates = [os.environ.get("OLLAMA_MODELS"), os.path.join(home, ".ollama", "models")]
+    elif provider == "LMSTUDIO":
+        candidates = [os.path.join(home, ".lmstudio", "models"),
+                      os.path.join(home, ".cache", "lm-studio", "models")]
+    else:
+        return None
+    for path in candidates:
+        if path and os.path.isdir(path):
+            return path
+    return None
+
+
+class LocalSource:
+    """A directory of models belonging to one local backend.
+
+    ``confirmed`` is False for a guessed directory that hasn't been matched
+    against the backend yet (see confirm()); its manifests aren't read.
+    """
+
+    def __init__(self, provider, path, confirmed=True):
+        self.provider = provider
+        if provider == "OLLAMA" and os.path.isdir(os.path.join(path, "manifests")):
+            path = os.path.join(path, "manifests")
+        self.path = path
+        # Only a manifests tree is read as the catalog, so only it needs confirming
+        self.confirmed = confirmed or provider != "OLLAMA"
+
+    @property
+    def direct(self):
+        """True when list_models() yields the backend's exact model ids."""
+        return self.provider == "OLLAMA" and self.confirmed
+
+    def confirm(self, models):
+        """Checks the directory against the ``models`` the backend reported (None if unreachable).
+
+        Returns whether the directory may be followed, i.e. whether its
+        manifests list exactly the models the backend does.
+        """
+        if not self.confirmed:
+            self.confirmed = models is not None and sorted(set(models)) == self.list_models()
+        return self.confirmed
+
+    def relevant(self, name, is_dir):
+        if is_dir or self.provider == "OLLAMA":
+            return not name.startswith('.')
+        return name.endswith(".gguf")
+
+    def _walk(self):
+        stack = [self.path]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif self.relevant(entry.name, False):
+                            yield entry
+            except OSError:
+                continue
+
+    def list_models(self):
+        """Returns the model ids in an Ollama manifests tree."""
+        models = []
+        for entry in self._walk():
+            parts = os.path.relpath(entry.path, self.path).split(os.sep)
+            if len(parts) != 4:
+                continue
+            registry, namespace, name, tag = parts
+            if registry == OLLAMA_REGISTRY:
+                prefix = "" if namespace == "library" else f"{namespace}/"
+            else:
+                prefix = f"{registry}/{namespace}/"
+            models.append(f"{prefix}{name}:{tag}")
+        return sorted(models)
+
+    def signature(self):
+        """Cheap fingerprint of the tree built from stat results only."""
+        signature = set()
+        for entry in self._walk():
+            st = entry.stat(follow_symlinks=False)
+            signature.add((entry.path, st.st_size, st.st_mtime_ns))
+        return frozenset(signature)
+
+    def __repr__(self):
+        return f"LocalSource({self.provider!r}, {self.path!r})"
+
+
+def local_sources(config, endpoints):
+    """Maps endpoint keys to the LocalSource of backends running on this machine.
+
+    ``<PROVIDER>_MODELS_DIR`` in the script config overrides the standard
+    location; an empty value means auto-detect, and an auto-detected
+    Ollama directory starts unconfirmed. llama.cpp serves whichever files
+    it was started with, not a directory of its own, so its models are
+    only followed with ``LLAMA_MODELS_DIR`` set.
+    """
+    sources = {}
+    for ep in endpoints:
+        host = urlsplit(ep.url).hostname or ""
+        if host not in LOCAL_HOSTS and not host.startswith("127."):
+            continue
+        configured = config.get(f"{ep.provider}_MODELS_DIR")
+        path = configured or default_models_dir(ep.provider)
+        if path and os.path.isdir(os.path.expanduser(path)):
+            sources[ep.key] = LocalSource(ep.provider, os.path.expanduser(path), confirmed=bool(configured))
+    return sources
+
+
+def _load_libc():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatcher:
+    """Recursive inotify watch that calls ``on_change()`` on relevant events."""
+
+    def __init__(self, source, on_change, libc):
+        self.source = source
+        self.on_change = on_change
+        self.libc = libc
+        self.fd = None
+        self.loop = None
+        self._wd_paths = {}
+
+    def _add_tree(self, root):
+        for directory, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self._wd_paths[wd] = directory
+
+    def start(self, loop):
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self._add_tree(self.source.path)
+        self.loop = loop
+        loop.add_reader(fd, self._on_readable)
+
+    def _on_readable(self):
+        relevant = False
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    offset += EVENT_HEADER.size
+                    name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                    offset += length
+                    is_dir = bool(mask & IN_ISDIR)
+                    if mask & IN_Q_OVERFLOW:
+                        relevant = True
+                    elif name and self.source.relevant(name, is_dir):
+                        relevant = True
+                        if is_dir and mask & (IN_CREATE | IN_MOVED_TO) and wd in self._wd_paths:
+                            # Watch new subdirectories (e.g. a freshly pulled model name)
+                            self._add_tree(os.path.join(self._wd_paths[wd], name))
+        except BlockingIOError:
+            pass
+        if relevant:
+            self.on_change()
+
+    def close(self):
+        if self.fd is not None:
+            if self.loop is not None:
+                self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+
+class PollingWatcher:
+    """Fallback that compares stat-only signatures every ``interval`` seconds."""
+
+    def __init__(self, source, on_change, interval=DEFAULT_SCAN_INTERVAL):
+        self.source = source
+        self.on_change = on_change
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        last = self.source.signature()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self.source.signature()
+            if current != last:
+                last = current
+                self.on_change()
+
+    def start(self, loop):
+        self._task = loop.create_task(self._run())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def start_watcher(source, on_change, loop):
+    """Starts the best available watcher for ``source`` and returns it."""
+    libc = _load_libc()
+    if libc is not None:
+        watcher = InotifyWatcher(source, on_change, libc)
+        try:
+            watcher.start(loop)
+            return watcher
+        except OSError:
+            watcher.close()
+    watcher = PollingWatcher(source, on_change)
+    watcher.start(loop)
+    return watcher
@@ -0,0 +1,237 @@
+"""Cross-process locking and single-flight coalescing for concurrent mu runs.
+
+Two kinds of lock keep overlapping runs (cron plus a manual run, several
+shells) from stepping on each other:
+
+* a config lock around every read-modify-write of an opencode.json, held
+  on a hidden ``.<name>.lock`` file next to it so that every user who can
+  see the config shares it;
+* a fetch lock making fetches single-flight: the run that holds it polls
+  the backends and publishes the results, and runs that start meanwhile
+  wait for it and reuse those results instead of polling again.
+
+Locks are advisory (flock, or msvcrt on Windows) and released by the OS if
+a run dies. Contention and wait time are kept in ``stats()``.
+"""
+import json
+import os
+import time
+
+from . import STATE_DIR, metrics
+from .persist import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_DIR = os.path.join(STATE_DIR, "locks")
+DEFAULT_TIMEOUT = 120      # seconds to wait for a lock before giving up
+POLL_INTERVAL = 0.05       # seconds between attempts while waiting
+
+# Lock name -> {"acquired", "contended", "waited", "coalesced"} for this process
+_stats = {}
+
+
+class LockTimeout(Exception):
+    """Raised when a lock is still held by another run after the timeout."""
+
+
+def stats():
+    """Per-lock counts and total seconds waited by this process.
+
+    ``contended`` counts acquisitions that had to wait for another run and
+    ``coalesced`` fetches whose results were reused from another run.
+    """
+    return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def _try_lock(fd, shared=False):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _open(path):
+    try:
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    except PermissionError:
+        # Someone else's lock file: a read-only descriptor can still be locked
+        return os.open(path, os.O_RDONLY)
+
+
+class FileLock:
+    """Exclusive lock on ``path``, usable as a context manager.
+
+    After ``acquire()``, ``contended`` tells whether another run held the
+    lock and ``waited`` how many seconds were spent waiting for it. Raises
+    LockTimeout after ``timeout`` seconds.
+    """
+
+    def __init__(self, path, name, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        self.contended = False
+        self.waited = 0.0
+        self._fd = None
+
+    def try_acquire(self):
+        """Takes the lock if it is free; returns False right away otherwise."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = _open(self.path)
+        if _try_lock(fd):
+            self._fd = fd
+            self._record()
+            return True
+        os.close(fd)
+        self.contended = True
+        return False
+
+    def acquire(self):
+        if self.try_acquire():
+            return self
+        fd = _open(self.path)
+        start = time.monotonic()
+        try:
+            with metrics.span("lock", lock=self.name):
+                while not _try_lock(fd):
+                    if time.monotonic() - start > self.timeout:
+                        raise LockTimeout(f"{self.path} is still locked by another run after {self.timeout:.0f}s")
+                    time.sleep(POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            self.waited = time.monotonic() - start
+            self._record(acquired=False)
+            raise
+        self._fd = fd
+        self.waited = time.monotonic() - start
+        self._record()
+        return self
+
+    def _record(self, acquired=True):
+        entry = _stats.setdefault(self.name, {"acquired": 0, "contended": 0, "waited": 0.0, "coalesced": 0})
+        entry["acquired"] += acquired
+        if self.contended:
+            entry["contended"] += 1
+            entry["waited"] += self.waited
+            metrics.count("lock_contention", lock=self.name)
+
+    def release(self):
+        if self._fd is not None:
+            try:
+                _unlock(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+def config_lock(path, timeout=DEFAULT_TIMEOUT):
+    """The lock guarding read-modify-write of one config file."""
+    path = os.path.realpath(path)
+    directory, name = os.path.split(path)
+    return FileLock(os.path.join(directory, f".{name}.lock"), "config", timeout)
+
+
+class SingleFlight:
+    """Lets one run fetch while concurrent runs wait for and reuse its results.
+
+    The leader holds the fetch lock while fetching. A run that finds the
+    lock taken registers as a waiter (a shared lock on a second file), then
+    blocks on the fetch lock. When the leader finishes and sees a waiter,
+    it publishes its results; each waiter then reuses them as long as they
+    were fetched for the same ``key`` and finished after the waiter
+    started. Otherwise, e.g. after a timeout, the waiter fetches itself.
+    """
+
+    def __init__(self, directory=LOCK_DIR, timeout=DEFAULT_TIMEOUT):
+        self.lock_path = os.path.join(directory, "fetch.lock")
+        self.waiters_path = os.path.join(directory, "fetch.waiters")
+        self.results_path = os.path.join(directory, "fetch.json")
+        self.timeout = timeout
+
+    def run(self, key, fetch):
+        """Returns ``(results, coalesced)``; ``fetch()`` produces the results when there is nothing to reuse.
+
+        ``key`` must be JSON-serializable and identify what is fetched.
+        ``coalesced`` is True when the results came from another run.
+        """
+        started = time.time()
+        lock = FileLock(self.lock_path, "fetch", self.timeout)
+        if not lock.try_acquire():
+            waiter = _open(self.waiters_path)
+            try:
+                _try_lock(waiter, shared=True)
+                lock.acquire()
+            except LockTimeout:
+                # A hung run must not stall everyone; fetch without it
+                return fetch(), False
+            finally:
+                os.close(waiter)
+            shared = self._load(key, started)
+            if shared is not None:
+                lock.release()
+                _stats["fetch"]["coalesced"] += 1
+                metrics.count("fetches_coalesced")
+                return shared, True
+        try:
+            results = fetch()
+            self._publish(key, started, results)
+            return results, False
+        finally:
+            lock.release()
+
+    def _has_waiters(self):
+        if fcntl is None:
+            return True
+        try:
+            fd = os.open(self.waiters_path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            if _try_lock(fd):
+                _unlock(fd)
+                return False
+            return True
+        finally:
+            os.close(fd)
+
+    def _publish(self, key, started, results):
+        if not self._has_waiters():
+            return
+        data = {"key": key, "started": started, "finished": time.time(), "results": results}
+        try:
+            atomic_write(self.results_path, json.dumps(data, separators=(",", ":")).encode())
+        except OSError:
+            pass  # Waiters will fetch themselves
+
+    def _load(self, key, started):
+        try:
+            with open(self.results_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("key") != key or data.get("finished", 0) < started:
+            return None
+        return data.get("results")
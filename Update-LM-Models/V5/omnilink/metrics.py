@@ -0,0 +1,245 @@
+"""Opt-in timing spans and counters for sync runs.
+
+Nothing is recorded until enable() is called: span() then returns a shared
+no-op context manager and count() returns immediately, so the calls can
+stay in production code paths. Recorded data is exported as a node_exporter
+textfile-collector ``.prom`` file and/or a Chrome trace-event JSON file
+(load it in chrome://tracing or https://ui.perfetto.dev).
+"""
+import contextvars
+import os
+import threading
+import time
+
+PREFIX = "omnilink"
+
+COUNTER_HELP = {
+    "syncs": "Times fetched catalogs were reconciled into opencode.json.",
+    "config_writes": "Times opencode.json (or a sync target) was rewritten.",
+    "fetches": "Catalog fetch attempts per provider.",
+    "fetch_failures": "Failed catalog fetches per provider and error class.",
+    "models_added": "Models added to opencode.json per provider.",
+    "models_removed": "Models removed from opencode.json per provider.",
+    "models_renamed": "Models whose display name was updated per provider.",
+    "models_enriched": "Models given context length / capability fields per provider.",
+    "detail_requests": "Model detail requests per provider (cache misses).",
+    "lock_contention": "Lock acquisitions that had to wait for another mu run, per lock.",
+    "fetches_coalesced": "Fetches skipped by reusing a concurrent run's results.",
+    "models_warmed": "Newly added models sent a warm-up completion, per provider and outcome.",
+}
+
+_recorder = None
+# Spans are grouped into tracks (one per endpoint while fetching); asyncio
+# tasks each get their own copy of the context, so concurrent fetches don't mix.
+_track = contextvars.ContextVar("omnilink_track", default="main")
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "attrs", "track", "start")
+
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.track = _track.get()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.recorder.spans.append((self.name, self.track, self.start, duration, self.attrs))
+        return False
+
+
+class Recorder:
+    """Spans and counters collected since the last reset()."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        # Targets are written from worker threads
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def phase_totals(self):
+        """Returns ``{span name: (total seconds, span count)}``."""
+        totals = {}
+        for name, _, _, duration, _ in self.spans:
+            seconds, n = totals.get(name, (0.0, 0))
+            totals[name] = (seconds + duration, n + 1)
+        return totals
+
+
+def enable():
+    """Starts recording; returns the active Recorder."""
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder()
+    return _recorder
+
+
+def recorder():
+    """The active Recorder, or None when instrumentation is off."""
+    return _recorder
+
+
+def span(name, **attrs):
+    """Context manager timing one phase, e.g. ``with span("connect", host=host):``."""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, attrs)
+
+
+def count(name, value=1, **labels):
+    """Adds ``value`` to the counter ``name`` with the given labels."""
+    if _recorder is not None:
+        _recorder.count(name, value, **labels)
+
+
+def set_track(name):
+    """Puts spans from the current task/thread on their own trace track."""
+    if _recorder is not None:
+        _track.set(name)
+
+
+def count_changes(diffs):
+    """Counts added/removed/renamed/enriched models from a ``{provider_key: ModelDiff}`` dict."""
+    if _recorder is None:
+        return
+    for provider_key, diff in diffs.items():
+        for kind in ("added", "removed", "renamed", "enriched"):
+            n = len(getattr(diff, kind))
+            if n:
+                _recorder.count(f"models_{kind}", n, provider=provider_key)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _previous_counters(path):
+    """Counter samples from an earlier export, so totals keep growing across runs."""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return values
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        sample, _, value = line.rpartition(" ")
+        if sample.split("{", 1)[0].endswith("_total"):
+            try:
+                values[sample] = float(value)
+            except ValueError:
+                pass
+    return values
+
+
+def _write(path, data):
+    from .persist import atomic_write
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    atomic_write(path, data)
+
+
+def write_prometheus(path, rec=None):
+    """Writes spans and counters as a node_exporter textfile-collector file.
+
+    Phase times describe the last sync; counters are cumulative: the values
+    already in ``path`` are carried over and this run's counts added.
+    """
+    rec = rec or _recorder
+    if rec is None:
+        return
+    lines = [
+        f"# HELP {PREFIX}_last_sync_timestamp_seconds Unix time of the last sync.",
+        f"# TYPE {PREFIX}_last_sync_timestamp_seconds gauge",
+        f"{PREFIX}_last_sync_timestamp_seconds {time.time():.3f}",
+    ]
+    totals = rec.phase_totals()
+    if totals:
+        lines += [
+            f"# HELP {PREFIX}_last_sync_phase_seconds Time spent per phase in the last sync, summed over endpoints.",
+            f"# TYPE {PREFIX}_last_sync_phase_seconds gauge",
+        ]
+        lines += [f'{PREFIX}_last_sync_phase_seconds{{phase="{_escape(name)}"}} {seconds:.6f}'
+                  for name, (seconds, _) in sorted(totals.items())]
+        lines += [
+            f"# HELP {PREFIX}_last_sync_phase_count Spans recorded per phase in the last sync.",
+            f"# TYPE {PREFIX}_last_sync_phase_count gauge",
+        ]
+        lines += [f'{PREFIX}_last_sync_phase_count{{phase="{_escape(name)}"}} {n}'
+                  for name, (_, n) in sorted(totals.items())]
+
+    counters = _previous_counters(path)
+    for (name, labels), value in rec.counters.items():
+        sample = _sample(f"{PREFIX}_{name}_total", labels)
+        counters[sample] = counters.get(sample, 0) + value
+    families = {}
+    for sample, value in counters.items():
+        families.setdefault(sample.split("{", 1)[0], []).append((sample, value))
+    for family in sorted(families):
+        name = family[len(PREFIX) + 1:-len("_total")]
+        lines.append(f"# HELP {family} {COUNTER_HELP.get(name, name.replace('_', ' ').capitalize() + '.')}")
+        lines.append(f"# TYPE {family} counter")
+        lines += [f"{sample} {_number(value)}" for sample, value in sorted(families[family])]
+    _write(path, ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def write_trace(path, rec=None):
+    """Writes the recorded spans as Chrome trace-event JSON, one track per endpoint."""
+    import json
+
+    rec = rec or _recorder
+    if rec is None:
+        return
+    tracks = {}
+    events = []
+    for name, track, start, duration, attrs in rec.spans:
+        tid = tracks.setdefault(track, len(tracks) + 1)
+        events.append({
+            "name": name, "cat": PREFIX, "ph": "X", "pid": 1, "tid": tid,
+            "ts": round((start - rec.origin) * 1e6, 1), "dur": round(duration * 1e6, 1),
+            "args": attrs,
+        })
+    for track, tid in tracks.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+    _write(path, json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}).encode("utf-8"))
@@ -0,0 +1,110 @@
+"""Atomic, write-only-on-change persistence of opencode.json and the JSON state files."""
+import json
+import os
+
+from . import metrics
+
+
+def _fsync_dir(directory):
+    # Makes the rename itself durable; not supported on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """Replaces ``path`` with ``data`` via temp file + fsync + rename.
+
+    Readers see either the old or the new file, never a truncated one.
+    Symlinks are followed so a dotfiles-managed config stays a link. Mode
+    and, when running as root for other users' configs, owner are kept.
+    """
+    # Only needed when something is written; no-op runs never pay for them
+    import shutil
+    import tempfile
+
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, tmp_path)
+            st = os.stat(path)
+            if hasattr(os, "chown") and (st.st_uid, st.st_gid) != (os.getuid(), os.getgid()):
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+def save_rendered(path, data, original, backups=None, changes=None):
+    """Writes ``data`` to ``path`` only if it differs from the ``original`` bytes.
+
+    Returns True when the file was rewritten, False when nothing was done.
+    When a ``backups`` store is given, the write and its ``changes``
+    summary are recorded there first.
+    """
+    if data == original:
+        return False
+    if backups is not None:
+        try:
+            with metrics.span("backup"):
+                backups.record(original, data, changes=changes)
+        except Exception:
+            pass  # Fail silently on backup
+    with metrics.span("write", bytes=len(data)):
+        atomic_write(path, data)
+    metrics.count("config_writes")
+    return True
+
+
+class JSONStore:
+    """A dict kept in one JSON file, the base of the updater's caches and state stores.
+
+    ``load()`` starts empty when the file is missing or unreadable, and
+    ``save()`` never raises: everything kept this way can be rebuilt, so a
+    sync never fails over it. ``pretty`` stores are written indented with
+    sorted keys, for files people read.
+    """
+
+    pretty = False
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except (OSError, ValueError):
+            self.entries = {}
+        return self
+
+    def save(self):
+        if self.pretty:
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+        else:
+            data = json.dumps(self.entries, separators=(",", ":"))
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            atomic_write(self.path, data.encode())
+        except OSError:
+            pass
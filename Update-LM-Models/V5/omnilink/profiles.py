@@ -0,0 +1,58 @@
+"""Persisted per-model load profiles measured by the warm-up stage."""
+import os
+import time
+
+from . import STATE_DIR
+from .persist import JSONStore
+
+DEFAULT_PROFILE_FILE = os.path.join(STATE_DIR, "profiles.json")
+PROFILE_MAX_AGE = 90 * 86400   # seconds before profiles of models no longer warmed are dropped
+
+
+def profile_key(url, model_id):
+    return f"{url}#{model_id}"
+
+
+class ProfileStore(JSONStore):
+    """Load-latency records keyed by endpoint URL and model id, loaded from and saved to JSON.
+
+    Each record holds the last successful warm-up's ``ttft_ms`` (first
+    completion, model cold), ``warm_ttft_ms`` (second completion, model
+    loaded) and ``load_ms`` (their difference), when it happened
+    (``warmed_at``), how many warm-ups succeeded (``samples``) and the
+    ``error`` of the last one if it failed.
+    """
+
+    pretty = True
+
+    def __init__(self, path=DEFAULT_PROFILE_FILE):
+        super().__init__(path)
+
+    def save(self):
+        cutoff = time.time() - PROFILE_MAX_AGE
+        self.entries = {key: rec for key, rec in self.entries.items()
+                        if max(rec.get("warmed_at", 0), rec.get("failed_at", 0)) >= cutoff}
+        super().save()
+
+    def get(self, url, model_id):
+        return self.entries.get(profile_key(url, model_id))
+
+    def record(self, outcome):
+        """Stores one warm_async outcome."""
+        rec = self.entries.setdefault(profile_key(outcome["url"], outcome["model"]), {"samples": 0})
+        if outcome["error"]:
+            rec["error"] = outcome["error"]
+            rec["failed_at"] = time.time()
+            return
+        rec.update(ttft_ms=outcome["ttft_ms"], warm_ttft_ms=outcome["warm_ttft_ms"], load_ms=outcome["load_ms"],
+                   warmed_at=time.time(), error=None)
+        rec["samples"] = rec.get("samples", 0) + 1
+
+    def slowest(self, url, models):
+        """``(model id, load_ms)`` of the slowest-loading profiled model among ``models``, or None."""
+        slowest = None
+        for model_id in models or ():
+            rec = self.entries.get(profile_key(url, model_id))
+            if rec and rec.get("load_ms") is not None and (slowest is None or rec["load_ms"] > slowest[1]):
+                slowest = (model_id, rec["load_ms"])
+        return slowest
@@ -0,0 +1,231 @@
+"""Backend adapters: one small class per kind of server.
+
+Every backend is polled through an adapter registered here. The adapter
+names the backend (config key, opencode provider key, labels, default
+port), says which catalog to read and how to recognise the backend during
+discovery. The fetch, reconcile and write code only ever talk to the
+adapter, so supporting a new server means adding one subclass::
+
+    @register
+    class TabbyAPI(Provider):
+        key = "TABBY"
+        provider_key = "tabby"
+        label = "TabbyAPI"
+        default_port = 5000
+        owners = ("tabbyAPI",)
+
+Adapters with a ``native_catalog`` read the backend's own model list
+instead of ``/v1/models``, which only has ids. Ollama's ``/api/tags``
+also carries each model's content digest, so a model that is re-pulled
+under the same name shows up as changed, and an unchanged one can be
+recognised and skipped by later stages.
+
+Adapters with a per-model detail endpoint (``detail_request`` and
+``parse_details``) let the enrichment stage fill in context length, tool
+support and modalities.
+"""
+from urllib.parse import quote
+
+from .jsonstream import CatalogParser
+
+OPENAI_PATH = "/v1/models"
+DEFAULT_OUTPUT_TOKENS = 8192   # limit.output when the backend doesn't say
+
+
+def model_fields(context=None, tools=None, vision=None, reasoning=None):
+    """OpenCode model fields for what a backend reported; unknown (None) values are left out."""
+    fields = {}
+    if isinstance(context, int) and not isinstance(context, bool) and context > 0:
+        fields["limit"] = {"context": context, "output": min(context, DEFAULT_OUTPUT_TOKENS)}
+    if tools is not None:
+        fields["tool_call"] = bool(tools)
+    if reasoning is not None:
+        fields["reasoning"] = bool(reasoning)
+    if vision is not None:
+        fields["attachment"] = bool(vision)
+        fields["modalities"] = {"input": ["text", "image"] if vision else ["text"], "output": ["text"]}
+    return fields
+
+# Internal key -> adapter instance, in registration order
+PROVIDERS = {}
+
+
+def register(cls):
+    """Class decorator adding an adapter to the registry."""
+    PROVIDERS[cls.key] = cls()
+    return cls
+
+
+class Provider:
+    """Base adapter for an OpenAI-compatible backend.
+
+    Subclasses set the class attributes; the defaults read ``/v1/models``.
+    ``native_catalog`` is a path under the server root whose JSON holds the
+    model list under ``native_list_key``, one entry per model with its id
+    under ``native_id_key`` and, if the backend reports one, a content
+    digest under ``digest_field``. ``owners`` are ``owned_by`` values in
+    ``/v1/models`` that only this backend uses, and ``native_probe`` a
+    ``(path, marker)`` pair: a JSON endpoint only this backend answers and
+    a key its response always has.
+    """
+
+    key = None
+    provider_key = None
+    label = None
+    default_port = None
+    style = "white"
+    owners = ()
+    native_probe = None
+    native_catalog = None
+    native_list_key = "data"
+    native_id_key = "id"
+    digest_field = None
+
+    @property
+    def name(self):
+        """Provider name written to opencode.json."""
+        return f"{self.label} (remote)"
+
+    def server_root(self, url):
+        """The server root of a ``.../v1/models`` URL, or None for other URLs."""
+        if url.endswith(OPENAI_PATH):
+            return url[:-len(OPENAI_PATH)]
+        return None
+
+    def catalog_url(self, url):
+        """URL to read the model list from, given the configured /v1/models URL."""
+        root = self.server_root(url)
+        if self.native_catalog is None or root is None:
+            return url
+        return root + self.native_catalog
+
+    def parser(self, native):
+        """A CatalogParser for the native catalog or for /v1/models."""
+        if not native:
+            return CatalogParser()
+        fields = (self.digest_field,) if self.digest_field else ()
+        return CatalogParser(fields=fields, list_key=self.native_list_key, id_key=self.native_id_key)
+
+    def split(self, entries, native):
+        """Turns parsed entries into ``(model ids, {id: digest} or None)``."""
+        if not native or not self.digest_field:
+            return [entry["id"] if isinstance(entry, dict) else entry for entry in entries], None
+        models = []
+        digests = {}
+        for entry in entries:
+            models.append(entry["id"])
+            if entry.get(self.digest_field):
+                digests[entry["id"]] = entry[self.digest_field]
+        return models, digests
+
+    def looks_like(self, data, entries):
+        """Weaker catalog heuristics, tried once no adapter claimed the ``owners``."""
+        return False
+
+    def detail_request(self, root, model_id):
+        """``(method, url, JSON body or None)`` describing one model, or None if there is no such endpoint."""
+        return None
+
+    def parse_details(self, doc):
+        """OpenCode model fields (see model_fields) from a detail response."""
+        return {}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.key}>"
+
+
+@register
+class Ollama(Provider):
+    key = "OLLAMA"
+    provider_key = "ollama"
+    label = "Ollama"
+    default_port = 11434
+    style = "cyan"
+    owners = ("library",)
+    native_probe = ("/api/version", "version")
+    native_catalog = "/api/tags"
+    native_list_key = "models"
+    native_id_key = "name"
+    digest_field = "digest"
+
+    def looks_like(self, data, entries):
+        return any(":" in str(entry.get("id", "")) for entry in entries)
+
+    def detail_request(self, root, model_id):
+        return "POST", root + "/api/show", {"model": model_id}
+
+    def parse_details(self, doc):
+        info = doc.get("model_info") or {}
+        context = info.get(f"{info.get('general.architecture')}.context_length")
+        capabilities = doc.get("capabilities")
+        if not isinstance(capabilities, list):
+            # Older servers don't list capabilities
+            return model_fields(context)
+        return model_fields(context, tools="tools" in capabilities, vision="vision" in capabilities,
+                            reasoning="thinking" in capabilities)
+
+
+@register
+class LMStudio(Provider):
+    key = "LMSTUDIO"
+    provider_key = "lmstudio"
+    label = "LM Studio"
+    default_port = 1234
+    style = "magenta"
+    owners = ("organization_owner",)
+    native_probe = ("/api/v0/models", "data")
+
+    def detail_request(self, root, model_id):
+        return "GET", root + "/api/v0/models/" + quote(model_id, safe=""), None
+
+    def parse_details(self, doc):
+        capabilities = doc.get("capabilities")
+        tools = "tool_use" in capabilities if isinstance(capabilities, list) else None
+        vision = doc["type"] == "vlm" if doc.get("type") in ("llm", "vlm") else None
+        return model_fields(doc.get("max_context_length"), tools=tools, vision=vision)
+
+
+@register
+class LlamaCpp(Provider):
+    key = "LLAMA"
+    provider_key = "llamacpp"
+    label = "Llama.cpp"
+    default_port = 8080
+    style = "yellow"
+    owners = ("llamacpp",)
+    native_probe = ("/props", "default_generation_settings")
+
+    def looks_like(self, data, entries):
+        # llama-server adds a duplicate "models" list and per-entry "meta"
+        return "models" in data or any("meta" in entry for entry in entries)
+
+    def detail_request(self, root, model_id):
+        # llama-server serves one model; /props describes it
+        return "GET", root + "/props", None
+
+    def parse_details(self, doc):
+        settings = doc.get("default_generation_settings") or {}
+        modalities = doc.get("modalities")
+        vision = modalities.get("vision") if isinstance(modalities, dict) else None
+        return model_fields(settings.get("n_ctx"), vision=vision)
+
+
+@register
+class VLLM(Provider):
+    key = "VLLM"
+    provider_key = "vllm"
+    label = "vLLM"
+    default_port = 8000
+    style = "green"
+    owners = ("vllm",)
+
+
+@register
+class KoboldCpp(Provider):
+    key = "KOBOLDCPP"
+    provider_key = "koboldcpp"
+    label = "KoboldCpp"
+    default_port = 5001
+    style = "blue"
+    owners = ("koboldcpp",)
+    native_probe = ("/api/extra/version", "result")
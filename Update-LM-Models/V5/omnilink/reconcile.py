@@ -0,0 +1,133 @@
+"""Set-based reconciliation of fetched model ids against opencode.json."""
+from .endpoints import provider_info
+
+
+def friendly_name(provider_key, model_id):
+    """Returns the display name OpenCode shows for a model id."""
+    if provider_key.split('-')[0] == 'ollama' and ':cloud' in model_id:
+        base_name = model_id.split(':')[0].replace('-', ' ').title()
+        return base_name + " Cloud"
+    return model_id.replace('-', ' ').replace('/', ' ').title()
+
+
+class ModelDiff:
+    """Changes needed to bring one provider's ``models`` block up to date.
+
+    ``added`` maps new ids to their entries, ``removed`` lists ids that are
+    gone, ``renamed`` maps existing ids to their new display name,
+    ``enriched`` maps existing ids to detail fields (``limit``,
+    ``tool_call``, ...) their entry doesn't have yet and ``unchanged`` lists
+    ids whose entries are left exactly as they are.
+    """
+
+    __slots__ = ("added", "removed", "renamed", "enriched", "unchanged")
+
+    def __init__(self, added, removed, renamed, unchanged, enriched=None):
+        self.added = added
+        self.removed = removed
+        self.renamed = renamed
+        self.enriched = enriched or {}
+        self.unchanged = unchanged
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed or self.renamed or self.enriched)
+
+    def apply(self, models):
+        """Applies the diff to a ``models`` dict in place, touching only changed entries."""
+        for model_id in self.removed:
+            del models[model_id]
+        for model_id, name in self.renamed.items():
+            models[model_id]["name"] = name
+        for model_id, fields in self.enriched.items():
+            models[model_id].update(fields)
+        models.update(self.added)
+
+    def summary(self):
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "renamed": len(self.renamed),
+            "enriched": len(self.enriched),
+            "unchanged": len(self.unchanged),
+        }
+
+
+def total_changes(diffs):
+    """Sums a ``{provider_key: ModelDiff}`` dict into added/removed/renamed/enriched counts."""
+    totals = {"added": 0, "removed": 0, "renamed": 0, "enriched": 0}
+    for diff in diffs.values():
+        totals["added"] += len(diff.added)
+        totals["removed"] += len(diff.removed)
+        totals["renamed"] += len(diff.renamed)
+        totals["enriched"] += len(diff.enriched)
+    return totals
+
+
+def reconcile_models(current, fetched_ids, provider_key, details=None, names=None):
+    """Compares a provider's current ``models`` dict with the fetched ids.
+
+    ``details`` maps ids to enrichment fields; they are only added where the
+    entry doesn't have that field yet, so hand-edited values are kept.
+    ``names`` maps ids to display names used instead of friendly_name().
+    Pure function: no argument is modified. Runs in O(n + m) using set
+    membership, so it stays fast for catalogs of 100k+ entries.
+    """
+    details = details or {}
+    names = names or {}
+    # dict.fromkeys de-duplicates while keeping the backend's order
+    fetched = dict.fromkeys(fetched_ids)
+    removed = [model_id for model_id in current if model_id not in fetched]
+    added = {}
+    renamed = {}
+    enriched = {}
+    unchanged = []
+    for model_id in fetched:
+        name = names.get(model_id) or friendly_name(provider_key, model_id)
+        entry = current.get(model_id)
+        fields = details.get(model_id)
+        if not isinstance(entry, dict):
+            # Missing, or a malformed entry that can't carry a name
+            added[model_id] = {"name": name, **(fields or {})}
+            continue
+        missing = {field: value for field, value in fields.items() if field not in entry} if fields else None
+        if missing:
+            enriched[model_id] = missing
+        if entry.get("name") != name:
+            renamed[model_id] = name
+        elif not missing:
+            unchanged.append(model_id)
+    return ModelDiff(added, removed, renamed, unchanged, enriched)
+
+
+def new_provider(provider_name, base_url, models=None):
+    """The provider block added to opencode.json for a backend it doesn't list yet."""
+    return {
+        "npm": "@ai-sdk/openai-compatible",
+        "name": provider_name,
+        "options": {"baseURL": base_url},
+        "models": {} if models is None else models
+    }
+
+
+def reconcile_results(fetched_models, current_models, names=None):
+    """Diffs every provider in a fetch_all results dict against its current models.
+
+    ``current_models(provider_key)`` returns a provider's ``models`` dict as
+    the config has it ({} for a provider it doesn't list yet); it is not
+    modified. ``names`` optionally overrides display names by model id.
+    Yields ``(provider_key, provider_name, base_url, models, diff)`` for
+    every endpoint that returned a model list.
+    """
+    for base_key, base_url in fetched_models.items():
+        if not base_key.endswith("_BASE"):
+            continue
+        key = base_key[:-len("_BASE")]
+        info = provider_info(key)
+        if info is None or fetched_models.get(key) is None:
+            continue
+        provider_key, provider_name = info
+        models = current_models(provider_key)
+        diff = reconcile_models(models, fetched_models[key], provider_key, fetched_models.get(f"{key}_DETAILS"),
+                                names)
+        yield provider_key, provider_name, base_url, models, diff
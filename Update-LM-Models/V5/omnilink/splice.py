@@ -0,0 +1,350 @@
+"""Surgical edits of opencode.json: only the model lists are rewritten.
+
+Parsing the whole config and dumping it again costs time proportional to
+the file and loses the user's key order and formatting everywhere, even
+in the MCP, agent and instruction sections the updater never touches.
+ConfigDocument instead scans the raw bytes (memory-mapped when read from
+disk) and records the byte span of every ``provider.<key>.models`` value.
+Other values are skipped by a regex matching balanced brackets and are
+never decoded; a LayoutCache lets later runs skip them altogether. Only
+the model lists being reconciled are parsed, and a change replaces just
+their span; every other byte is copied as is.
+New providers, and providers without a ``models`` key, are inserted as
+members using the file's own indentation and line endings.
+"""
+import json
+import mmap
+import re
+
+from . import metrics
+from .persist import save_rendered
+from .reconcile import new_provider, reconcile_results
+
+WHITESPACE = re.compile(rb"[ \t\n\r]*")
+INDENT = re.compile(rb"[ \t]*")
+SCALAR = re.compile(rb"-?[0-9][0-9eE.+-]*|true|false|null")
+STRUCTURAL = re.compile(rb'[\[\]{}"]')
+STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+PROVIDER_KEY = re.compile(rb'"provider"[ \t\n\r]*:[ \t\n\r]*$')
+MAX_DEPTH = 12   # nesting skipped by one regex match; deeper values fall back to a loop
+
+
+def _balanced(depth):
+    """A regex matching one object or array nested up to ``depth`` levels.
+
+    Python 3.11+ gets possessive quantifiers, which never backtrack; the
+    fallback only repeats single characters so it stays linear too.
+    """
+    string = STRING.pattern
+    try:
+        inner = rb'(?:' + string + rb'|[^"{}\[\]]++)*+'
+        for _ in range(depth):
+            inner = rb'(?:' + string + rb'|[^"{}\[\]]++|[\[{]' + inner + rb'[\]}])*+'
+        return re.compile(rb'[\[{]' + inner + rb'[\]}]')
+    except re.error:
+        inner = rb'(?:' + string + rb'|[^"{}\[\]])*'
+        for _ in range(depth):
+            inner = rb'(?:' + string + rb'|[^"{}\[\]]|[\[{]' + inner + rb'[\]}])*'
+        return re.compile(rb'[\[{]' + inner + rb'[\]}]')
+
+
+_balanced_re = None   # compiled on first use; it takes a couple of milliseconds
+
+
+def _skip_ws(buf, pos):
+    return WHITESPACE.match(buf, pos).end()
+
+
+def _expect(buf, pos, char):
+    if buf[pos:pos + 1] != char:
+        raise ValueError(f"Expected {char.decode()!r} at byte {pos}")
+    return pos + 1
+
+
+def _skip_string(buf, pos):
+    match = STRING.match(buf, pos)
+    if match is None:
+        raise ValueError(f"Unterminated string at byte {pos}")
+    return match.end()
+
+
+def _skip_value(buf, pos):
+    """End offset of the JSON value starting at ``pos``, without decoding it."""
+    char = buf[pos:pos + 1]
+    if char == b'"':
+        return _skip_string(buf, pos)
+    if char not in (b"{", b"["):
+        match = SCALAR.match(buf, pos)
+        if match is None:
+            raise ValueError(f"Invalid value at byte {pos}")
+        return match.end()
+    global _balanced_re
+    if _balanced_re is None:
+        _balanced_re = _balanced(MAX_DEPTH)
+    match = _balanced_re.match(buf, pos)
+    if match is not None:
+        return match.end()
+    # Deeper than MAX_DEPTH (or malformed): walk the structural characters
+    depth = 0
+    while True:
+        match = STRUCTURAL.search(buf, pos)
+        if match is None:
+            raise ValueError("Truncated config")
+        char = match.group()
+        if char == b'"':
+            pos = _skip_string(buf, match.start())
+            continue
+        pos = match.end()
+        depth += 1 if char in (b"{", b"[") else -1
+        if depth == 0:
+            return pos
+
+
+class _Object:
+    """Byte offsets of one JSON object: its braces and ``{key: (key start, value start, value end)}``."""
+
+    __slots__ = ("start", "end", "members")
+
+    def __init__(self, buf, pos):
+        self.start = pos
+        self.members = {}
+        pos = _skip_ws(buf, _expect(buf, pos, b"{"))
+        if buf[pos:pos + 1] == b"}":
+            self.end = pos + 1
+            return
+        while True:
+            key_start = pos
+            pos = _skip_string(buf, pos)
+            key = json.loads(bytes(buf[key_start:pos]).decode("utf-8"))
+            pos = _skip_ws(buf, _expect(buf, _skip_ws(buf, pos), b":"))
+            value_end = _skip_value(buf, pos)
+            # Like json.loads, the last of duplicate keys wins
+            self.members.pop(key, None)
+            self.members[key] = (key_start, pos, value_end)
+            pos = _skip_ws(buf, value_end)
+            if buf[pos:pos + 1] == b"}":
+                self.end = pos + 1
+                return
+            pos = _skip_ws(buf, _expect(buf, pos, b","))
+
+    def child(self, buf, key):
+        """The member ``key`` as an _Object, None if absent; ValueError if it isn't an object."""
+        span = self.members.get(key)
+        if span is None:
+            return None
+        if buf[span[1]:span[1] + 1] != b"{":
+            raise ValueError(f"'{key}' is not an object")
+        return _Object(buf, span[1])
+
+
+class ConfigDocument:
+    """The raw bytes of an opencode.json plus the spans the updater may touch.
+
+    ``reconcile()`` diffs fetched models against the config and records
+    the edits instead of changing a parsed config; ``render()`` returns
+    the original bytes with those edits spliced in. A ``layout`` recorded
+    earlier for the same bytes (see layout()) skips scanning everything
+    before the ``provider`` section. Raises ValueError if the data is not a JSON object or
+    ``provider`` (or one of its entries or model lists) is not an object.
+    """
+
+    def __init__(self, data, layout=None):
+        self.data = data
+        with metrics.span("read", bytes=len(data)):
+            self._root = None
+            start = layout.get("provider") if isinstance(layout, dict) else None
+            if (isinstance(start, int) and data[start:start + 1] == b"{"
+                    and PROVIDER_KEY.search(data[max(0, start - 64):start])):
+                self._providers = _Object(data, start)
+                self.newline = layout.get("newline", "\n")
+                self.indent = layout.get("indent")
+            else:
+                self._scan()
+            self._entries = {}
+            for key in (self._providers.members if self._providers else ()):
+                entry = self._providers.child(data, key)
+                models = entry.members.get("models")
+                if models is not None and data[models[1]:models[1] + 1] != b"{":
+                    raise ValueError(f"'provider.{key}.models' is not an object")
+                self._entries[key] = entry
+        self._models = {}      # provider key -> reconciled models dict
+        self._added = {}       # provider key -> new provider block
+
+    def _scan(self):
+        data = self.data
+        self._root = _Object(data, _skip_ws(data, 0))
+        if _skip_ws(data, self._root.end) != len(data):
+            raise ValueError("Trailing data after config")
+        self._providers = self._root.child(data, "provider")
+        self.newline = "\r\n" if b"\r\n" in data[:self._root.end] else "\n"
+        self.indent = self._indent_of(next(iter(self._root.members.values()))[0]) if self._root.members else "  "
+
+    def layout(self):
+        """What a later ConfigDocument over these bytes, or the ones save() writes, may skip; None if nothing."""
+        if self._providers is None:
+            return None
+        return {"provider": self._providers.start, "indent": self.indent, "newline": self.newline}
+
+    @property
+    def changed(self):
+        return bool(self._models or self._added)
+
+    @property
+    def original(self):
+        return bytes(self.data)
+
+    def _indent_of(self, pos):
+        """Whitespace before ``pos`` on its line, or None if other text precedes it (minified)."""
+        line_start = self.data.rfind(b"\n", 0, pos) + 1
+        prefix = bytes(self.data[line_start:pos])
+        if line_start == 0 or prefix.strip(b" \t"):
+            return None
+        return prefix.decode("ascii")
+
+    def current_models(self, provider_key):
+        """The ``models`` of one provider, pending edits included; only that span is decoded."""
+        if provider_key in self._models:
+            return self._models[provider_key]
+        if provider_key in self._added:
+            return self._added[provider_key]["models"]
+        entry = self._entries.get(provider_key)
+        span = entry.members.get("models") if entry else None
+        if span is None:
+            return {}
+        return json.loads(bytes(self.data[span[1]:span[2]]).decode("utf-8"))
+
+    def reconcile(self, fetched_models, names=None):
+        """Reconciles a fetch_all results dict.
+
+        Returns the updated provider names and a ``{provider_key: ModelDiff}`` dict.
+        """
+        with metrics.span("reconcile"):
+            updated_providers = []
+            diffs = {}
+            for provider_key, provider_name, base_url, models, diff in reconcile_results(
+                    fetched_models, self.current_models, names):
+                updated_providers.append(provider_name.split(' ')[0])
+                diffs[provider_key] = diff
+                entry = self._entries.get(provider_key)
+                if not diff.changed and (provider_key in self._models or provider_key in self._added
+                                         or entry is not None and "models" in entry.members):
+                    continue
+                models = dict(models)
+                diff.apply(models)
+                if entry is not None:
+                    self._models[provider_key] = models
+                elif provider_key in self._added:
+                    self._added[provider_key]["models"] = models
+                else:
+                    self._added[provider_key] = new_provider(provider_name, base_url, models)
+            return updated_providers, diffs
+
+    def _render_value(self, value, indent):
+        if indent is None or self.indent is None:
+            return json.dumps(value, separators=(",", ":"))
+        return json.dumps(value, indent=self.indent).replace("\n", self.newline + indent)
+
+    def _insert(self, obj, members):
+        """An edit adding ``members`` (``[(key, value)]``) at the end of ``obj``."""
+        if obj.members:
+            key_start, _, value_end = list(obj.members.values())[-1]
+            indent = self._indent_of(key_start)
+            if indent is None or self.indent is None:
+                separator, colon = ",", ":"
+            else:
+                separator, colon = "," + self.newline + indent, ": "
+            text = "".join(separator + json.dumps(key) + colon + self._render_value(value, indent)
+                           for key, value in members)
+            return value_end, value_end, text
+        if self.indent is None:
+            text = ",".join(json.dumps(key) + ":" + self._render_value(value, None) for key, value in members)
+            return obj.start + 1, obj.end - 1, text
+        # An empty object: indent one level deeper than the line its brace is on
+        line_start = self.data.rfind(b"\n", 0, obj.start) + 1
+        outer = INDENT.match(self.data, line_start).group().decode("ascii")
+        indent = outer + self.indent
+        text = ",".join(self.newline + indent + json.dumps(key) + ": " + self._render_value(value, indent)
+                        for key, value in members)
+        return obj.start + 1, obj.end - 1, text + self.newline + outer
+
+    def edits(self):
+        """The pending ``(start, end, text)`` replacements, in file order."""
+        edits = []
+        for provider_key, models in self._models.items():
+            entry = self._entries[provider_key]
+            span = entry.members.get("models")
+            if span is None:
+                edits.append(self._insert(entry, [("models", models)]))
+            else:
+                edits.append((span[1], span[2], self._render_value(models, self._indent_of(span[0]))))
+        if self._added:
+            if self._providers is None:
+                edits.append(self._insert(self._root, [("provider", self._added)]))
+            else:
+                edits.append(self._insert(self._providers, list(self._added.items())))
+        return sorted(edits, key=lambda edit: edit[0])
+
+    def render(self):
+        """The config bytes with every pending edit spliced in."""
+        with metrics.span("render"):
+            parts = []
+            pos = 0
+            for start, end, text in self.edits():
+                parts.append(self.data[pos:start])
+                parts.append(text.encode("utf-8"))
+                pos = end
+            parts.append(self.data[pos:])
+            return b"".join(parts)
+
+    def save(self, path, backups=None, changes=None, layouts=None):
+        """Writes the edits to ``path`` (atomically, via save_rendered); returns True if it was rewritten.
+
+        The document is closed first, since a mapped file can't be
+        replaced on Windows. ``layouts`` (a LayoutCache) learns the new
+        file's layout.
+        """
+        if not self.changed:
+            return False
+        data = self.render()
+        original = self.original
+        self.close()
+        written = save_rendered(path, data, original, backups, changes)
+        if written and layouts is not None:
+            # Edits never move the provider section; a newly inserted one is found next time
+            layouts.put(path, self.layout())
+        return written
+
+    def close(self):
+        """Unmaps the file; the document can't be used afterwards."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def read_document(path, layouts=None):
+    """Memory-maps ``path`` into a ConfigDocument; close it (or use ``with``) when done.
+
+    With a LayoutCache, a file unchanged since it was last read or written
+    is only scanned from its ``provider`` section on.
+    """
+    layout = layouts.get(path) if layouts is not None else None
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return ConfigDocument(f.read())
+    try:
+        document = ConfigDocument(data, layout)
+    except BaseException:
+        data.close()
+        raise
+    if layouts is not None and layout is None:
+        layouts.put(path, document.layout())
+    return document
@@ -0,0 +1,146 @@
+"""Fan-out sync: one fetch reconciled into many opencode.json files.
+
+A targets file lists the configs to keep in sync, e.g. every engineer's
+``~/.config/opencode/opencode.json`` on a shared server plus project-local
+configs::
+
+    [
+        "~alice/.config/opencode/opencode.json",
+        {"path": "/srv/app/opencode.json",
+         "providers": ["ollama", "llamacpp-*"],
+         "names": {"qwen2.5-coder:32b": "Qwen Coder (team)"}}
+    ]
+
+Each target takes only the providers matching its ``providers`` patterns
+(all when omitted) and its own display-name overrides. Targets are read,
+reconciled and atomically written in parallel worker threads, under the
+same per-file lock as the single-config sync; each keeps its own backup
+history.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import STATE_DIR, metrics
+from .backups import BackupStore, DEFAULT_KEEP, DEFAULT_MAX_AGE_DAYS
+from .cache import LayoutCache
+from .endpoints import provider_info
+from .lock import config_lock
+from .reconcile import total_changes
+from .splice import read_document
+
+DEFAULT_WORKERS = 8
+TARGET_BACKUP_DIR = os.path.join(STATE_DIR, "backups", "targets")
+
+
+class Target:
+    """One opencode.json to keep in sync.
+
+    ``providers`` holds fnmatch patterns of opencode provider keys
+    (``ollama``, ``lmstudio-*``); empty means every provider. ``names``
+    maps model ids to display names used instead of the generated ones.
+    """
+
+    def __init__(self, path, providers=(), names=None):
+        self.path = os.path.expanduser(path)
+        self.providers = tuple(providers)
+        self.names = dict(names or {})
+
+    def includes(self, provider_key):
+        return not self.providers or any(fnmatch.fnmatchcase(provider_key, p) for p in self.providers)
+
+    def select(self, results):
+        """The part of a fetch_all results dict this target takes.
+
+        Reconciliation walks the ``_BASE`` keys, so dropping those of
+        excluded endpoints is enough to leave their providers alone.
+        """
+        selected = {}
+        for key, value in results.items():
+            if key.endswith("_BASE"):
+                info = provider_info(key[:-len("_BASE")])
+                if info is None or not self.includes(info[0]):
+                    continue
+            selected[key] = value
+        return selected
+
+    def backups(self, keep=DEFAULT_KEEP, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """A BackupStore of this target's own, so histories never mix."""
+        digest = hashlib.sha256(os.path.realpath(self.path).encode()).hexdigest()[:16]
+        return BackupStore(os.path.join(TARGET_BACKUP_DIR, digest), keep, max_age_days)
+
+    def __repr__(self):
+        return f"Target({self.path!r})"
+
+
+def load_targets(path):
+    """Reads a targets file: a JSON list of paths or ``{"path", "providers", "names"}`` objects.
+
+    A ``{"targets": [...]}`` object is accepted too. Raises ValueError when
+    the file is malformed and OSError when it can't be read.
+    """
+    with open(os.path.expanduser(path), 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("targets")
+    if not isinstance(data, list):
+        raise ValueError("Targets file must hold a list of targets")
+    targets = []
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+            raise ValueError(f"Invalid target: {entry!r}")
+        providers = entry.get("providers", [])
+        names = entry.get("names", {})
+        if isinstance(providers, str):
+            providers = [providers]
+        if not isinstance(providers, list) or not isinstance(names, dict):
+            raise ValueError(f"Invalid providers or names for target {entry['path']}")
+        targets.append(Target(entry["path"], providers, names))
+    return targets
+
+
+def sync_target(target, results, backups=None, layouts=None):
+    """Reconciles ``results`` into one target and writes it if anything changed.
+
+    ``layouts`` is an optional LayoutCache. Never raises: returns
+    ``{"path", "providers", "diffs", "written", "error"}``.
+    """
+    outcome = {"path": target.path, "providers": [], "diffs": {}, "written": False, "error": None}
+    if not os.path.exists(target.path):
+        outcome["error"] = "not found"
+        return outcome
+    try:
+        with config_lock(target.path), read_document(target.path, layouts) as document:
+            providers, diffs = document.reconcile(target.select(results), target.names)
+            metrics.count("syncs")
+            outcome["written"] = document.save(target.path, backups, total_changes(diffs), layouts)
+    except Exception as e:
+        outcome["error"] = str(e) or type(e).__name__
+        return outcome
+    if outcome["written"]:
+        metrics.count_changes(diffs)
+    outcome["providers"] = providers
+    outcome["diffs"] = diffs
+    return outcome
+
+
+def sync_targets(targets, results, backups_for=None, workers=DEFAULT_WORKERS):
+    """Writes every target in parallel from one results dict; returns their outcomes in order.
+
+    ``backups_for(target)`` returns the BackupStore for a target (or None);
+    by default each target gets its own store under TARGET_BACKUP_DIR.
+    """
+    backups_for = backups_for or Target.backups
+    layouts = LayoutCache().load()
+    try:
+        if len(targets) <= 1:
+            return [sync_target(target, results, backups_for(target), layouts) for target in targets]
+        with ThreadPoolExecutor(max_workers=min(workers, len(targets))) as pool:
+            return list(pool.map(lambda target: sync_target(target, results, backups_for(target), layouts),
+                                 targets))
+    finally:
+        layouts.save()
@@ -0,0 +1,99 @@
+"""Post-sync warm-up: loads newly added models and profiles how long that takes.
+
+The first request to a freshly pulled model pays its whole cold-load cost
+on the backend. The warm-up stage pays it right after the sync instead,
+by sending each new model a minimal streamed completion (one token), then
+a second one once it is loaded. Time to the first streamed byte of each
+gives the cold and warm time-to-first-token; their difference is the
+load time. Outcomes go to a ProfileStore.
+
+Requests run concurrently but at most ``per_host`` at a time against any
+one host name, whatever its port, so backends sharing a GPU box aren't
+made to load several models at once.
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from . import httpclient, metrics
+
+DEFAULT_CONCURRENCY = 8      # warm-ups in flight at once
+PER_HOST_CONCURRENCY = 1     # ... and against any one host
+DEFAULT_TIMEOUT = 300        # seconds per completion; loading a large model takes a while
+COMPLETION_PATH = "/v1/chat/completions"
+WARM_MAX_SIZE = 1024 * 1024
+
+
+async def _first_byte(client, url, model_id, timeout):
+    """Sends one minimal streamed completion; returns the seconds until its first streamed byte."""
+    start = time.perf_counter()
+    first = []
+
+    def consumer(chunk):
+        if not first:
+            first.append(time.perf_counter())
+
+    request = {"model": model_id, "messages": [{"role": "user", "content": "Hi"}], "max_tokens": 1, "stream": True}
+    response = await client.post_json(url, request, timeout=timeout, consumer=consumer, max_size=WARM_MAX_SIZE)
+    if response.status != 200:
+        raise httpclient.HTTPError(f"HTTP {response.status}")
+    return (first[0] if first else time.perf_counter()) - start
+
+
+async def _warm(ep, model_id, client, timeout):
+    outcome = {"provider": ep.provider_key, "model": model_id, "url": ep.url,
+               "ttft_ms": None, "warm_ttft_ms": None, "load_ms": None, "error": None}
+    root = ep.adapter.server_root(ep.url)
+    if root is None:
+        outcome["error"] = "not a /v1/models URL"
+        return outcome
+    try:
+        with metrics.span("warm", model=model_id):
+            cold = await _first_byte(client, root + COMPLETION_PATH, model_id, timeout)
+            warm = await _first_byte(client, root + COMPLETION_PATH, model_id, timeout)
+    except asyncio.TimeoutError:
+        outcome["error"] = "timeout"
+    except Exception as e:
+        outcome["error"] = str(e) or type(e).__name__
+    else:
+        outcome["ttft_ms"] = round(cold * 1000, 1)
+        outcome["warm_ttft_ms"] = round(warm * 1000, 1)
+        outcome["load_ms"] = round(max(0.0, cold - warm) * 1000, 1)
+    metrics.count("models_warmed", provider=ep.provider_key, outcome="error" if outcome["error"] else "ok")
+    return outcome
+
+
+async def warm_async(models, profiles=None, client=None, concurrency=DEFAULT_CONCURRENCY,
+                     per_host=PER_HOST_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+    """Warms every ``(endpoint, model id)`` in ``models``; returns one outcome dict per model, in order.
+
+    Outcomes hold ``provider``, ``model``, ``url``, ``ttft_ms``,
+    ``warm_ttft_ms``, ``load_ms`` and ``error`` (None on success). With a
+    ProfileStore as ``profiles``, each outcome is recorded there.
+    """
+    if not models:
+        return []
+    owns_client = client is None
+    if owns_client:
+        client = httpclient.HTTPClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    hosts = {}
+
+    async def run(ep, model_id):
+        host = hosts.setdefault(urlsplit(ep.url).hostname, asyncio.Semaphore(per_host))
+        async with host, semaphore:
+            outcome = await _warm(ep, model_id, client, timeout)
+        if profiles is not None:
+            profiles.record(outcome)
+        return outcome
+
+    try:
+        return await asyncio.gather(*(run(ep, model_id) for ep, model_id in models))
+    finally:
+        if owns_client:
+            await client.close()
+
+
+def warm(models, **kwargs):
+    """Synchronous entry point for warm_async."""
+    return asyncio.run(warm_async(models, **kwargs))
@@ -0,0 +1,227 @@
+"""Long-running watch mode: adaptive per-endpoint polling with change-only writes."""
+import asyncio
+import os
+import random
+
+from . import httpclient, metrics
+from .fetch import DEFAULT_MAX_RESPONSE, DEFAULT_TIMEOUT, FetchError, fetch_catalog, record_fetch
+from .enrich import enrich_async
+from .localfs import start_watcher
+from .lock import config_lock
+from .persist import save_rendered
+from .reconcile import total_changes
+from .splice import ConfigDocument, read_document
+
+DEFAULT_MIN_INTERVAL = 5     # seconds between polls right after a change
+DEFAULT_MAX_INTERVAL = 300   # ceiling for stable or unreachable endpoints
+DEBOUNCE = 0.25              # seconds to let a burst of file events settle
+
+
+class Backoff:
+    """Adaptive poll interval for one endpoint.
+
+    Drops to ``min_interval`` whenever the catalog changes and doubles on
+    every unchanged or failed poll, up to ``max_interval``. A little jitter
+    keeps a fleet of endpoints from being polled in lockstep.
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+
+    def update(self, changed):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        return self.interval * random.uniform(0.9, 1.1)
+
+    def reset(self):
+        self.interval = self.min_interval
+
+
+class ConfigState:
+    """opencode.json kept in memory (as a ConfigDocument) between polls.
+
+    Only a poll that produces a diff costs a splice and a write. If the
+    file is edited behind the daemon's back (or by another mu run, which
+    takes the same config lock), it is re-read and every endpoint's last
+    known models are reconciled into the fresh copy.
+    """
+
+    def __init__(self, path, backups=None, names=None):
+        self.path = path
+        self.backups = backups
+        self.names = names
+        self.document = None
+        self.results = {}
+        self._signature = None
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        if self.document is not None:
+            self.document.close()
+        self.document = read_document(self.path)
+        self._signature = self._stat()
+
+    def apply(self, fetched):
+        """Reconciles a (partial) fetch_all results dict; returns ``(diffs, written)``."""
+        self.results.update(fetched)
+        with config_lock(self.path):
+            if self._signature is None or self._stat() != self._signature:
+                self.load()
+                fetched = self.results
+            _, diffs = self.document.reconcile(fetched, self.names)
+            if not self.document.changed:
+                return diffs, False
+
+            data = self.document.render()
+            original = self.document.original
+            layout = self.document.layout()
+            # Unmapped before the file is replaced; reloaded next time should the write fail
+            self.document.close()
+            self._signature = None
+            written = save_rendered(self.path, data, original, self.backups, total_changes(diffs))
+            if written:
+                metrics.count_changes(diffs)
+            self.document = ConfigDocument(data, layout)
+            self._signature = self._stat()
+        return diffs, written
+
+
+class FanoutState:
+    """Keeps several sync targets in memory at once, like one ConfigState each.
+
+    Every poll is applied to each target's share of the results; the diffs
+    come back keyed ``<path>:<provider key>``.
+    """
+
+    def __init__(self, targets, backups_for):
+        self.states = [(target, ConfigState(target.path, backups_for(target), target.names))
+                       for target in targets]
+
+    def load(self):
+        for _, state in self.states:
+            state.load()
+
+    def apply(self, fetched):
+        diffs = {}
+        written = False
+        for target, state in self.states:
+            target_diffs, target_written = state.apply(target.select(fetched))
+            diffs.update((f"{target.path}:{key}", diff) for key, diff in target_diffs.items())
+            written = written or target_written
+        return diffs, written
+
+
+async def watch_async(endpoints, state, on_event=None, on_error=None, min_interval=DEFAULT_MIN_INTERVAL,
+                      max_interval=DEFAULT_MAX_INTERVAL, timeout=DEFAULT_TIMEOUT, sources=None,
+                      validators=None, initial=None, max_size=DEFAULT_MAX_RESPONSE, details=None):
+    """Keeps every endpoint in sync forever.
+
+    Every endpoint is polled on its own adaptive schedule. Endpoints with
+    a LocalSource in ``sources`` (keyed by endpoint key) are also refreshed
+    as soon as their model directory changes. A confirmed Ollama manifests
+    tree is the catalog itself: it is read without any HTTP request and
+    only re-read when it changes (or its last update failed).
+
+    ``on_event(endpoint, models, diffs, written)`` is called when an
+    endpoint's catalog changes, or when it goes down (``models`` is None)
+    or comes back. ``on_error(endpoint, exc)`` reports a failed config
+    update; the change is retried on the next poll. One pooled client and
+    one set of ETag ``validators`` (e.g. CatalogCache.entries) serve every
+    poll. ``initial`` results, typically from the catalog cache, are
+    reconciled before the first poll so the config is usable immediately.
+    With a DetailCache as ``details``, changed catalogs are enriched with
+    model details before they are reconciled. Config updates run in a
+    worker thread, so waiting for another run's config lock never stalls
+    the polls.
+    """
+    client = httpclient.HTTPClient()
+    validators = {} if validators is None else validators
+    lock = asyncio.Lock()
+    sources = sources or {}
+    await asyncio.to_thread(state.load)
+    if initial:
+        if details is not None:
+            details.fill(endpoints, initial)
+        await asyncio.to_thread(state.apply, initial)
+
+    async def refresh(ep, status):
+        source = sources.get(ep.key)
+        metrics.set_track(ep.key)
+        digests = None
+        if source is not None and source.direct:
+            models = source.list_models()
+        else:
+            try:
+                with metrics.span("fetch", endpoint=ep.key):
+                    models, digests = await fetch_catalog(ep.url, client, timeout, validators, max_size, ep.adapter)
+                record_fetch(ep)
+            except FetchError as e:
+                models = None
+                record_fetch(ep, e.kind)
+        was_up = status.get("up")
+        # A re-pulled model keeps its id but gets a new digest
+        changed = models is not None and (models, digests) != status.get("last")
+        if changed:
+            fetched = {f"{ep.key}_BASE": ep.base, ep.key: models}
+            if digests is not None:
+                fetched[f"{ep.key}_DIGESTS"] = digests
+            try:
+                if details is not None and await enrich_async([ep], fetched, details, client=client):
+                    details.save()
+                async with lock:
+                    diffs, written = await asyncio.to_thread(state.apply, fetched)
+                status["last"] = models, digests
+                status["failed"] = False
+                if on_event:
+                    on_event(ep, models, diffs, written)
+            except Exception as e:
+                # "last" is left as it was, so the next refresh applies the change again
+                changed = False
+                status["failed"] = True
+                if on_error:
+                    on_error(ep, e)
+        elif on_event and ((models is None and was_up is not False)
+                           or (models is not None and was_up is False)):
+            on_event(ep, models, {}, False)
+        status["up"] = models is not None
+        return changed
+
+    async def poll(ep, source=None):
+        backoff = Backoff(min_interval, max_interval)
+        status = {}
+        trigger = asyncio.Event()
+        watcher = None if source is None else start_watcher(source, trigger.set, asyncio.get_running_loop())
+        try:
+            while True:
+                delay = backoff.update(await refresh(ep, status))
+                # Manifests are the catalog itself, so they're only re-read when they change
+                if source is not None and source.direct and not status.get("failed"):
+                    delay = None
+                try:
+                    await asyncio.wait_for(trigger.wait(), delay)
+                except asyncio.TimeoutError:
+                    continue
+                # A directory change: refresh once the burst of events settles
+                await asyncio.sleep(DEBOUNCE)
+                trigger.clear()
+                backoff.reset()
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    try:
+        await asyncio.gather(*(poll(ep, sources.get(ep.key)) for ep in endpoints))
+    finally:
+        await client.close()
+
+
+def watch(endpoints, state, on_event=None, on_error=None, **kwargs):
+    """Synchronous entry point for watch_async; runs until interrupted."""
+    asyncio.run(watch_async(endpoints, state, on_event=on_event, on_error=on_error, **kwargs))
@@ -2,11 +2,20 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
 import os
+import queue
 import sys
 import threading
-import urllib.request
-import urllib.error
-import time
+
+# The sync engine is shared with the V5 TUI
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "V5"))
+from omnilink.backups import BackupStore
+from omnilink.cache import DetailCache
+from omnilink.endpoints import endpoints_from_config
+from omnilink.enrich import enrich
+from omnilink.fetch import fetch_all
+from omnilink.lock import config_lock
+from omnilink.reconcile import total_changes
+from omnilink.splice import read_document
 
 # Configuration Paths (Windows Specific)
 # Assuming OpenCode stores config in %USERPROFILE%/.config/opencode/opencode.json on Windows as well, 
@@ -15,6 +24,9 @@ CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "opencode")
 OPENCODE_CONFIG_FILE = os.path.join(CONFIG_DIR, "opencode.json")
 SCRIPT_CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".update-models-config-win")
 
+# How often the Tk main loop drains events posted by the update worker
+POLL_INTERVAL_MS = 50
+
 class ModelUpdaterApp:
     def __init__(self, root):
         self.root = root
@@ -28,6 +40,11 @@ class ModelUpdaterApp:
         }
         self.load_config()
 
+        # Events from the update worker thread; only the Tk main loop touches widgets
+        self.events = queue.Queue()
+        self.pending = 0
+        self.total = 0
+
         # Styles
         style = ttk.Style()
         style.configure("TButton", padding=6, relief="flat", background="#ccc")
@@ -109,17 +126,9 @@ class ModelUpdaterApp:
             self.log(f"Error saving config: {e}")
             messagebox.showerror("Error", f"Could not save config: {e}")
 
-    def fetch_models(self, url):
-        try:
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=5) as response:
-                if response.status == 200:
-                    data = json.loads(response.read().decode())
-                    if 'data' in data and isinstance(data['data'], list):
-                        return [model['id'] for model in data['data']]
-        except Exception as e:
-            return None
-        return None
+    def post(self, *event):
+        """Queues an event for the main loop; safe to call from any thread."""
+        self.events.put(event)
 
     def start_update(self):
         self.update_btn.config(state='disabled')
@@ -134,137 +143,115 @@ class ModelUpdaterApp:
         self.config["LMSTUDIO_URL"] = self.lmstudio_entry.get()
         self.config["LLAMA_URL"] = self.llama_entry.get()
 
-        threading.Thread(target=self.run_update_process).start()
+        endpoints = endpoints_from_config(self.config)
+        self.total = self.pending = len(endpoints)
+        self.log("Checking " + ", ".join(ep.label for ep in endpoints) + "...")
+        threading.Thread(target=self.run_update_process, args=(endpoints,), daemon=True).start()
+        self.root.after(POLL_INTERVAL_MS, self.process_events)
 
-    def run_update_process(self):
-        results = {}
-        results["OLLAMA_BASE"] = self.config["OLLAMA_URL"].replace("/models", "")
-        results["LMSTUDIO_BASE"] = self.config["LMSTUDIO_URL"].replace("/models", "")
-        results["LLAMA_BASE"] = self.config["LLAMA_URL"].replace("/models", "")
+    def run_update_process(self, endpoints):
+        """Worker thread: fetches every endpoint concurrently, then updates the config.
 
-        # Step 1: Check Ollama
-        self.log("Checking Ollama...")
-        models = self.fetch_models(self.config["OLLAMA_URL"])
-        results["OLLAMA"] = models
-        if models:
-            self.log(f"Ollama: Found {len(models)} models.")
-        else:
-            self.log("Ollama: Connection failed or no models found.")
-        self.progress['value'] = 33
+        Never touches Tk; progress and results are posted to ``self.events``.
+        """
+        def on_result(ep, models, elapsed, error):
+            self.post("result", ep, models, elapsed, error)
 
-        # Step 2: Check LM Studio
-        self.log("Checking LM Studio...")
-        models = self.fetch_models(self.config["LMSTUDIO_URL"])
-        results["LMSTUDIO"] = models
-        if models:
-            self.log(f"LM Studio: Found {len(models)} models.")
-        else:
-            self.log("LM Studio: Connection failed or no models found.")
-        self.progress['value'] = 66
+        try:
+            # Every backend is polled at once, so the slowest one sets the total time
+            results = fetch_all(endpoints, on_result=on_result)
+            # Context length and capabilities of models not seen before
+            details = DetailCache().load()
+            if enrich(endpoints, results, details):
+                details.save()
+            self.post("log", "Updating OpenCode configuration...")
+            outcome = self.update_opencode_config(results)
+        except Exception as e:
+            self.post("log", f"Error: {e}")
+            outcome = ([], 0, False)
+        self.post("done", *outcome)
 
-        # Step 3: Check Llama.cpp
-        self.log("Checking Llama.cpp...")
-        models = self.fetch_models(self.config["LLAMA_URL"])
-        results["LLAMA"] = models
+    def process_events(self):
+        """Applies queued worker events to the UI; reschedules itself until the run is done."""
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == "log":
+                self.log(event[1])
+            elif kind == "result":
+                self.show_result(*event[1:])
+            elif kind == "done":
+                self.finish_update(*event[1:])
+                return
+        self.root.after(POLL_INTERVAL_MS, self.process_events)
+
+    def show_result(self, ep, models, elapsed, error):
         if models:
-            self.log(f"Llama.cpp: Found {len(models)} models.")
+            self.log(f"{ep.label}: Found {len(models)} models ({elapsed * 1000:.0f} ms).")
+        elif error:
+            self.log(f"{ep.label}: Connection failed ({error}).")
         else:
-            self.log("Llama.cpp: Connection failed or no models found.")
-        self.progress['value'] = 90
+            self.log(f"{ep.label}: Connection failed or no models found.")
+        self.pending -= 1
+        self.progress['value'] = 90 * (self.total - self.pending) / max(self.total, 1)
 
-        # Step 4: Update Config
-        self.log("Updating OpenCode configuration...")
-        updated_providers, removed_count = self.update_opencode_config(results)
-        
+    def finish_update(self, updated_providers, removed_count, written):
         self.progress['value'] = 100
         self.log("-" * 30)
         if updated_providers:
             self.log(f"Updated providers: {', '.join(updated_providers)}")
             if removed_count > 0:
                 self.log(f"Removed {removed_count} unavailable models.")
-            self.log("Success! Restart OpenCode to see changes.")
-            messagebox.showinfo("Update Complete", "OpenCode configuration updated successfully!")
+            if written:
+                self.log("Success! Restart OpenCode to see changes.")
+                messagebox.showinfo("Update Complete", "OpenCode configuration updated successfully!")
+            else:
+                self.log("OpenCode configuration is already up to date.")
+                messagebox.showinfo("Update Complete", "OpenCode configuration is already up to date.")
         else:
             self.log("No updates made. Check your connections.")
             messagebox.showwarning("Update Failed", "No providers could be reached.")
 
-        self.root.after(0, lambda: self.update_btn.config(state='normal'))
-        self.root.after(0, lambda: self.save_btn.config(state='normal'))
+        self.update_btn.config(state='normal')
+        self.save_btn.config(state='normal')
 
     def update_opencode_config(self, fetched_models):
+        """Runs on the worker thread; reports problems through the event queue."""
         if not os.path.exists(OPENCODE_CONFIG_FILE):
-            self.log(f"Error: Config file not found at {OPENCODE_CONFIG_FILE}")
-            return [], 0
+            self.post("log", f"Error: Config file not found at {OPENCODE_CONFIG_FILE}")
+            return [], 0, False
 
+        # Shares the command-line updater's lock, so a cron run can't interleave
         try:
-            with open(OPENCODE_CONFIG_FILE, 'r') as f:
-                opencode_config = json.load(f)
+            with config_lock(OPENCODE_CONFIG_FILE):
+                return self.update_locked(fetched_models)
         except Exception as e:
-            self.log(f"Error reading OpenCode config: {e}")
-            return [], 0
-
-        total_removed = 0
-        updated_providers = []
-
-        if 'provider' not in opencode_config:
-            opencode_config['provider'] = {}
+            self.post("log", f"Error locking OpenCode config: {e}")
+            return [], 0, False
 
-        provider_map = {
-            "OLLAMA": ("ollama", "Ollama (remote)"),
-            "LMSTUDIO": ("lmstudio", "LM Studio (remote)"),
-            "LLAMA": ("llamacpp", "Llama.cpp (remote)")
-        }
-
-        for key, (provider_key, provider_name) in provider_map.items():
-            if key in fetched_models and fetched_models[key] is not None:
-                models = fetched_models[key]
-                base_url = fetched_models[f"{key}_BASE"]
-                
-                updated_providers.append(provider_name.split(' ')[0])
-
-                if provider_key not in opencode_config['provider']:
-                    opencode_config['provider'][provider_key] = {
-                        "npm": "@ai-sdk/openai-compatible",
-                        "name": provider_name,
-                        "options": {"baseURL": base_url},
-                        "models": {}
-                    }
-                
-                # Remove non-present models
-                current_models = list(opencode_config['provider'][provider_key]['models'].keys())
-                for model in current_models:
-                    if model not in models:
-                        del opencode_config['provider'][provider_key]['models'][model]
-                        total_removed += 1
-                
-                # Add/Update models
-                for model_id in models:
-                    friendly_name = model_id
-                    if provider_key == 'ollama' and ':cloud' in model_id:
-                        base_name = model_id.split(':')[0].replace('-', ' ').title()
-                        friendly_name = base_name + " Cloud"
-                    else:
-                        friendly_name = model_id.replace('-', ' ').replace('/', ' ').title()
-                    
-                    opencode_config['provider'][provider_key]['models'][model_id] = {"name": friendly_name}
-
-        # Backup
-        backup_file = f"{OPENCODE_CONFIG_FILE}.backup.{int(time.time())}"
+    def update_locked(self, fetched_models):
         try:
-            with open(OPENCODE_CONFIG_FILE, 'r') as src, open(backup_file, 'w') as dst:
-                dst.write(src.read())
-        except Exception:
-            pass
-
-        # Save
-        try:
-            with open(OPENCODE_CONFIG_FILE, 'w') as f:
-                json.dump(opencode_config, f, indent=2)
+            document = read_document(OPENCODE_CONFIG_FILE)
         except Exception as e:
-            self.log(f"Error saving OpenCode config: {e}")
-            return [], 0
+            self.post("log", f"Error reading OpenCode config: {e}")
+            return [], 0, False
+
+        with document:
+            updated_providers, diffs = document.reconcile(fetched_models)
+            changes = total_changes(diffs)
+            total_removed = changes["removed"]
+
+            # Only changed model lists are rewritten; backup and save are skipped when nothing changed
+            try:
+                written = document.save(OPENCODE_CONFIG_FILE, BackupStore(), changes)
+            except Exception as e:
+                self.post("log", f"Error saving OpenCode config: {e}")
+                return [], 0, False
 
-        return updated_providers, total_removed
+        return updated_providers, total_removed, written
 
 if __name__ == "__main__":
     root = tk.Tk()